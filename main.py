@@ -8,32 +8,52 @@ Gemini で日本語要約したうえで Bluesky に自動投稿するボット
   1. sites.yaml から監視対象サイト一覧を読み込む
   2. processed_urls.json（state）から前回の処理状況を復元する
   3. Bluesky にログイン（prod モード時のみ）
-  4. サイトごとに以下を実行:
+  4. 全サイトの新着記事を並列に取得する
+  5. サイトごとに以下を実行:
      a. 前回失敗した記事（retry_ids）を再試行
-     b. 新着記事を取得して Gemini 要約 → Bluesky 投稿
-  5. 処理結果を state に保存する
+     b. 新着記事を Gemini 要約 → Bluesky 投稿
+     c. 処理結果を state に保存する（prod モード時。投稿成功ごとにも保存する）
 """
 
 import os
-import json
+import re
+import orjson
+import bisect
+import calendar
+import hashlib
+import heapq
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import yaml
-import feedparser
+import ijson
+import random
 import logging
 import time
-import random
-import httpx
-from google import genai
-from atproto import Client, models
-from atproto_client.exceptions import InvokeTimeoutError
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
+# PyYAML が libyaml 付きでビルドされていれば C 実装のローダーを使う（無ければ純 Python 版）
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
+# feedparser / google.genai / atproto / httpx は import に時間がかかるため、
+# 実際に使う関数の中で import する（test モードや一部サイトのみの実行で起動を速くする）。
+
 # =========================================================
 # 定数定義
 # =========================================================
 
 SITES_FILE = "sites.yaml"           # 監視サイト設定ファイル
 STATE_FILE = "processed_urls.json"  # 処理済み記事の状態管理ファイル
+SUMMARY_CACHE_FILE = "summary_cache.json"  # Gemini 要約結果のキャッシュファイル
+
+HTTP_USER_AGENT = "bstool/1.0 (+https://github.com/adadev001/bstool)"  # HTTP リクエストの User-Agent
 
 MAX_POST_LENGTH = 140        # Bluesky 投稿の最大文字数
 SUMMARY_HARD_LIMIT = 100     # Gemini 要約文の上限文字数（これを超えた場合は末尾を「…」で切る）
@@ -43,6 +63,20 @@ POSTED_ID_MAX = 1000            # state に保持する投稿済み ID の最大
 
 RETRY_LIMIT = 3       # 1回の実行で再試行する記事の上限件数
 GEMINI_RETRY_MAX = 2  # Gemini 失敗時にフォールバック投稿→再要約を試みる最大回数
+SUMMARY_CACHE_MAX = 500  # 要約キャッシュに保持する最大件数（超えたら古い順に削除）
+SUMMARY_CACHE_RETENTION_DAYS = 30  # 要約キャッシュを保持する日数
+GEMINI_CONCURRENCY = 4  # サイト単位でまとめて要約する際の Gemini 同時リクエスト数
+FETCH_CONCURRENCY = 8   # 新着記事を並列取得する際のサイト同時接続数
+CARD_FETCH_CONCURRENCY = 4  # リンクカード（OGP・サムネイル）を並列取得する際の同時接続数
+
+THUMBNAIL_MAX_BYTES = 1_000_000  # リンクカードに添付するサムネイル画像の最大サイズ（バイト）
+
+POST_RATE_LIMIT = 30    # POST_RATE_WINDOW 秒あたりに許可する Bluesky 投稿数
+POST_RATE_WINDOW = 300  # 投稿数を数える時間窓（秒）
+POST_429_RETRY_MAX = 2      # Bluesky が 429 を返した場合に同じ投稿を再試行する回数
+POST_429_DEFAULT_WAIT = 60  # 429 応答に待機時間の指定がない場合の待機秒数
+POST_429_WAIT_MAX = 300     # 待機指定がこれを超える場合（時間・日単位の上限）は待たずに次回実行へ持ち越す
+GEMINI_RPM_LIMIT = 14    # 1 分あたりに送る Gemini リクエスト数の上限（無料枠 15 RPM の手前）
 
 
 # =========================================================
@@ -57,7 +91,8 @@ def isoformat(dt: datetime) -> str:
     """datetime を ISO 8601 形式（ミリ秒付き・末尾Z）の文字列に変換する。
     例: 2025-03-01T12:00:00.000Z
     """
-    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    return (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+            f"T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}Z")
 
 def parse_iso(ts: str) -> datetime:
     """ISO 8601 形式の文字列を datetime（UTC）に変換する。
@@ -70,31 +105,86 @@ def parse_iso(ts: str) -> datetime:
 # 設定 / state 読み込み・保存
 # =========================================================
 
+# 読み込み・書き込みしたファイル内容のハッシュ（path → digest）。
+# 内容が変わっていない場合に同じバイト列を書き直さないために使う。
+_json_file_digests = {}
+
+def _json_digest(body):
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+def read_json(path):
+    """JSON ファイルを読み込んで返す。
+    ファイルが存在しない or 破損している場合は空の辞書を返す。
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        body = f.read()
+    try:
+        data = orjson.loads(body)
+    except Exception:
+        return {}
+    _json_file_digests[path] = _json_digest(body)
+    return data
+
+def write_json_atomic(path, data):
+    """JSON を一時ファイルに書き出してから os.replace で置き換える。
+    書き込み途中でプロセスが落ちても、元のファイルが壊れた状態で残らない。
+    シリアライズには orjson を使う（UTF-8 のまま出力され、標準 json より高速）。
+    直前に読み込んだ / 書き込んだ内容と同一の場合は書き込みを省略する。
+    """
+    body = orjson.dumps(data)
+    digest = _json_digest(body)
+    if _json_file_digests.get(path) == digest and os.path.exists(path):
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    _json_file_digests[path] = digest
+
 def load_config():
     """sites.yaml を読み込んで辞書として返す。
     サイト一覧・動作モード・各種設定が含まれる。
     """
     with open(SITES_FILE, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YamlSafeLoader)
 
 def load_state():
     """processed_urls.json から前回実行時の処理状況を読み込む。
     ファイルが存在しない or 破損している場合は空の辞書を返す。
     """
-    if not os.path.exists(STATE_FILE):
-        return {}
-    with open(STATE_FILE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
+    return read_json(STATE_FILE)
 
 def save_state(state):
     """処理状況を processed_urls.json に書き出す。
-    prod モードかつ state に変更があった場合のみ呼び出される。
+    prod モードで、サイトごとの処理完了時と全サイト処理後（未保存の変更がある場合）に呼び出される。
+    state は実行ごとに全体を書き直すため、インデントなしのコンパクトな形式で出力して
+    書き込み量を抑える（indent=2 ではファイルサイズがおよそ倍になる）。
+    """
+    write_json_atomic(STATE_FILE, state)
+
+def load_summary_cache():
+    """summary_cache.json から Gemini 要約キャッシュを読み込む。
+    ファイルが存在しない or 破損している場合は空の辞書を返す。
     """
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    return read_json(SUMMARY_CACHE_FILE)
+
+def save_summary_cache(cache):
+    """要約キャッシュを summary_cache.json に書き出す。
+    prune_posted_ids と同様に、SUMMARY_CACHE_RETENTION_DAYS 日より古いものと
+    SUMMARY_CACHE_MAX 件を超えた分（cached_at の古い順）を削除してから保存する。
+    save_state と同様に、実行ごとに全体を書き直すためインデントなしのコンパクトな形式で出力する。
+    """
+    # cached_at は isoformat() の固定書式なので文字列比較で新旧を判定できる
+    cutoff = isoformat(utc_now() - timedelta(days=SUMMARY_CACHE_RETENTION_DAYS))
+    for key in [k for k, v in cache.items() if v.get("cached_at", "") < cutoff]:
+        del cache[key]
+    if len(cache) > SUMMARY_CACHE_MAX:
+        sorted_items = sorted(cache.items(), key=lambda x: x[1].get("cached_at", ""))
+        for key, _ in sorted_items[:-SUMMARY_CACHE_MAX]:
+            del cache[key]
+    write_json_atomic(SUMMARY_CACHE_FILE, cache)
 
 
 # =========================================================
@@ -124,9 +214,10 @@ def normalize_site_state(site_key, raw_state, now, mode):
     # 旧バージョン: posted_ids がリスト形式だった場合
     if isinstance(raw_state, list):
         # リスト → 辞書（全件を現在時刻で登録）に変換
+        now_iso = isoformat(now)
         return {
             "last_checked_at": None,
-            "posted_ids": {cid: isoformat(now) for cid in raw_state},
+            "posted_ids": {cid: now_iso for cid in raw_state},
             "retry_ids": [],
             "entries": {},
             "known_cves": []
@@ -136,7 +227,8 @@ def normalize_site_state(site_key, raw_state, now, mode):
     migrated = False
     posted = raw_state.get("posted_ids")
     if isinstance(posted, list):
-        raw_state["posted_ids"] = {cid: isoformat(now) for cid in posted}
+        now_iso = isoformat(now)
+        raw_state["posted_ids"] = {cid: now_iso for cid in posted}
         migrated = True
 
     # 新しいキーが存在しない場合はデフォルト値を補完（キーの追加に対する後方互換）
@@ -158,16 +250,22 @@ def prune_posted_ids(posted_ids: dict, now: datetime):
     """
     before = len(posted_ids)
 
+    # 投稿日時は isoformat() の固定書式（ミリ秒付き・末尾Z）で保存しているため、
+    # 文字列の大小比較がそのまま日時の前後比較になる。parse_iso は呼ばずに比較する。
+
     # 条件1: 保持期限切れのエントリを削除
-    cutoff = now - timedelta(days=POSTED_ID_RETENTION_DAYS)
-    expired = [cid for cid, ts in posted_ids.items() if parse_iso(ts) < cutoff]
-    for cid in expired:
-        del posted_ids[cid]
+    # 1 件ずつ del せず、期限内のエントリだけで 1 回の走査で作り直す（挿入順は維持される）
+    cutoff = isoformat(now - timedelta(days=POSTED_ID_RETENTION_DAYS))
+    kept = {cid: ts for cid, ts in posted_ids.items() if ts >= cutoff}
+    if len(kept) != before:
+        posted_ids.clear()
+        posted_ids.update(kept)
 
     # 条件2: 上限件数を超えた場合、古い順に超過分を削除
-    if len(posted_ids) > POSTED_ID_MAX:
-        sorted_items = sorted(posted_ids.items(), key=lambda x: parse_iso(x[1]))
-        for cid, _ in sorted_items[:-POSTED_ID_MAX]:
+    # 全件ソートはせず、削除対象の超過分だけをヒープで取り出す
+    overflow = len(posted_ids) - POSTED_ID_MAX
+    if overflow > 0:
+        for cid, _ in heapq.nsmallest(overflow, posted_ids.items(), key=lambda x: x[1]):
             del posted_ids[cid]
 
     return before - len(posted_ids)
@@ -177,19 +275,17 @@ def prune_posted_ids(posted_ids: dict, now: datetime):
 # 共通ユーティリティ
 # =========================================================
 
+# CVSS 深刻度の境界値（昇順）とラベル。bisect で該当区間を求める
+CVSS_SEVERITY_THRESHOLDS = (4.0, 7.0, 9.0)
+CVSS_SEVERITY_LABELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
 def cvss_to_severity(score: float) -> str:
     """CVSS スコアを深刻度ラベルに変換する。
     CVSS v3 の基準に準拠:
       9.0以上 → CRITICAL / 7.0以上 → HIGH / 4.0以上 → MEDIUM / それ以下 → LOW
+    境界値ちょうどは上位ラベルに含めるため bisect_right を使う。
     """
-    if score >= 9.0:
-        return "CRITICAL"
-    elif score >= 7.0:
-        return "HIGH"
-    elif score >= 4.0:
-        return "MEDIUM"
-    else:
-        return "LOW"
+    return CVSS_SEVERITY_LABELS[bisect.bisect_right(CVSS_SEVERITY_THRESHOLDS, score)]
 
 def safe_truncate(text: str, limit: int) -> str:
     """文字数が limit を超える場合、limit-1 文字で切って末尾に「…」を付ける。
@@ -204,6 +300,15 @@ def safe_truncate(text: str, limit: int) -> str:
 # 本文前処理
 # =========================================================
 
+# NVD / JVN 本文から脆弱性の説明に関連する行を抽出するためのキーワード。
+# 行ごとに lower() + キーワード数ぶんの部分文字列検索を行う代わりに、
+# 1 本の正規表現にまとめて C 実装の re で一度に走査する。
+# （従来どおり部分一致。"allow" は "allows" も含む）
+# 本文全体を一度だけ lower() した文字列に対して使うため、大文字小文字は区別しない指定をしない。
+BODY_KEYWORDS_RE = re.compile(
+    r"allow|could|can|vulnerability|attack|execute|disclosure|denial"
+)
+
 def body_trim(text, max_len=2500, site_type=None):
     """Gemini に渡す前に記事本文を前処理して不要な行を取り除く。
 
@@ -217,37 +322,58 @@ def body_trim(text, max_len=2500, site_type=None):
     """
     if site_type in ("nvd_api", "jvn"):
         # 脆弱性関連キーワードを含む行のみ抽出
-        lines = [
-            l.strip()
-            for l in text.splitlines()
-            if any(k in l.lower() for k in [
-                "allow", "allows", "could", "can",
-                "vulnerability", "attack", "execute",
-                "disclosure", "denial"
-            ])
-        ]
+        # （lower() は本文全体に 1 回だけ行い、小文字版の行で判定して元の行を出力する）
+        # 結合後の長さが max_len に達した時点で残りの行の判定を打ち切る
+        lines = []
+        total = 0
+        for l, low in zip(text.splitlines(), text.lower().splitlines()):
+            if (s := l.strip()) and BODY_KEYWORDS_RE.search(low):
+                lines.append(s)
+                total += len(s) + 1  # 区切りのスペース分を含む
+                if total > max_len:
+                    break
         return " ".join(lines)[:max_len]
 
     # RSS: 短すぎる行を除いた先頭 6 行を使用
-    lines = [l.strip() for l in text.splitlines() if len(l.strip()) > 10]
-    return "\n".join(lines[:6])[:max_len]
+    # （strip は 1 行につき 1 回だけ行い、その結果で長さ判定する）
+    # 6 行集まった時点で残りの行は判定しない
+    lines = islice((s for l in text.splitlines() if len(s := l.strip()) > 10), 6)
+    return "\n".join(lines)[:max_len]
 
 
 # =========================================================
 # CVE 既投稿チェック（NVD / JVN 横断重複防止）
 # =========================================================
 
-def is_cve_already_posted(cid, site_type, state):
+def build_known_cve_index(state):
+    """全サイトの known_cves をまとめた集合を作る。
+
+    記事ごとに全サイトの known_cves（リスト）を走査する代わりに、
+    実行開始時に 1 度だけ集合にまとめて O(1) で判定できるようにする。
+    投稿成功時は process_item が known_cves と合わせてこの集合にも追加する。
+    """
+    return {
+        cid
+        for site_state in state.values()
+        if isinstance(site_state, dict)
+        for cid in site_state.get("known_cves", [])
+    }
+
+def is_cve_already_posted(cid, site_type, state, index=None):
     """同一 CVE が複数ソース（NVD・JVN 等）に存在する場合の重複投稿を防ぐ。
 
     NVD と JVN は同じ CVE を別々に掲載するため、
     いずれかのサイトで投稿済みの CVE ID は全サイトの known_cves を横断して確認する。
     RSS 記事はこのチェックの対象外（CVE ID を持たないため）。
+    index に build_known_cve_index の集合を渡した場合は、その集合で判定する。
     """
     # RSS は CVE ID ベースの重複チェック対象外
     if not cid or site_type == "rss":
         return False
 
+    if index is not None:
+        return cid in index
+
     # 全サイトの known_cves を横断確認
     for site_state in state.values():
         if isinstance(site_state, dict) and cid in site_state.get("known_cves", []):
@@ -259,8 +385,11 @@ def is_cve_already_posted(cid, site_type, state):
 # 投稿文生成
 # =========================================================
 
-def format_post(site, summary, item):
-    """Bluesky に投稿するテキストを組み立てる。
+def make_formatter(site):
+    """サイトごとに特化した投稿文生成関数を返す。
+
+    サイト種別の判定はサイト単位で一度だけ行い、記事ごとの
+    site["type"] 参照・分岐を省く。返り値は formatter(summary, item) -> str。
 
     NVD / JVN の場合:
       要約文 + 改行 + CVE ID と CVSS スコア・深刻度の行を付加する。
@@ -271,16 +400,55 @@ def format_post(site, summary, item):
     RSS（通常記事）の場合:
       要約文のみ（URL は embed カードとして別途添付される）。
     """
-    # 要約文が MAX_POST_LENGTH を超える場合は切り捨て、改行はスペースに変換
-    summary_text = safe_truncate(summary.replace("\n", " "), MAX_POST_LENGTH)
+    def _summary_text(summary):
+        # 要約文が MAX_POST_LENGTH を超える場合は切り捨て、改行はスペースに変換
+        return safe_truncate(summary.replace("\n", " "), MAX_POST_LENGTH)
 
     if site["type"] in ("nvd_api", "jvn"):
-        score = item.get("score", 0)
-        severity = cvss_to_severity(score)
-        cve_line = f"{item['id']} CVSS {score} | {severity}"
-        return f"{summary_text}\n{cve_line}"
+        def _format_cve(summary, item):
+            score = item.get("score", 0)
+            cve_line = f"{item['id']} CVSS {score} | {cvss_to_severity(score)}"
+            return f"{_summary_text(summary)}\n{cve_line}"
+        return _format_cve
+
+    def _format_rss(summary, item):
+        return _summary_text(summary)
+    return _format_rss
+
+def format_post(site, summary, item):
+    """Bluesky に投稿するテキストを組み立てる（make_formatter の単発呼び出し版）。"""
+    return make_formatter(site)(summary, item)
+
+
+# =========================================================
+# HTTP セッション（使い回し用）
+# =========================================================
 
-    return summary_text
+# RSS / JVN フィード・NVD / cardyb / サムネイル画像の取得で共有する requests セッション。
+# requests.get() を直接呼ぶと呼び出しごとに TCP + TLS 接続を張り直すため、
+# セッションのコネクションプールで keep-alive 接続を使い回す。
+# 5xx の一時的なエラーは urllib3 の Retry で自動的に再試行する
+# （429 は呼び出し側で次回持ち越しを判断するため対象外）。
+# requests 既定の User-Agent（python-requests/x.y）は Cloudflare 等の WAF で
+# 拒否されやすく、フィード取得失敗は空フィードとして扱われて気付きにくいため、明示的に設定する。
+def _build_http_session():
+    session = requests.Session()
+    session.headers["User-Agent"] = HTTP_USER_AGENT
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+http_session = _build_http_session()
 
 
 # =========================================================
@@ -290,13 +458,18 @@ def format_post(site, summary, item):
 # モジュール内でひとつだけ保持するクライアントインスタンス。
 # 記事ごとに Client() を生成すると接続オーバーヘッドが生じるため、
 # 初回呼び出し時に生成し、以降は使い回す（シングルトンパターン）。
+# summarize_items からスレッド並列で呼ばれるため、生成はロックで保護する。
 _gemini_client = None
+_gemini_client_lock = threading.Lock()
 
 def get_gemini_client(api_key):
     """Gemini クライアントを取得する。未生成なら生成して返す。"""
     global _gemini_client
     if _gemini_client is None:
-        _gemini_client = genai.Client(api_key=api_key)
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                from google import genai
+                _gemini_client = genai.Client(api_key=api_key)
     return _gemini_client
 
 
@@ -311,38 +484,77 @@ def get_gemini_client(api_key):
 # ※ gemini-2.0-flash は 2026年6月1日に廃止予定のため使用しない。
 GEMINI_MODELS = ["gemini-2.5-flash-lite", "gemini-2.5-flash"]
 
-# 429 / 503（レート制限・過負荷）発生時の指数バックオフ待機秒数。
+# 429 / 5xx（レート制限・過負荷・一時的なサーバーエラー）発生時の指数バックオフ待機秒数。
 # attempt 2回目以降: 5秒 → 15秒 → 30秒 → 60秒 と段階的に増加させ、
 # API の制限解除を待ちながら再試行する。
 GEMINI_BACKOFF = [5, 15, 30, 60]
 
+# バックオフ待機に加えるランダムな揺らぎ（待機秒数に対する割合）。
+# 並列要約の各スレッドが同じタイミングで一斉に再試行しないようにする。
+GEMINI_BACKOFF_JITTER = 0.2
+
+# 429 応答の google.rpc.RetryInfo に含まれる待機指定（例: 'retryDelay': '59s'）
+GEMINI_RETRY_DELAY_RE = re.compile(r"""retryDelay['"]?\s*:\s*['"]?(\d+(?:\.\d+)?)s""")
+# retryDelay がこの秒数を超える場合は待たずに次モデルへフォールバックする
+GEMINI_RETRY_DELAY_MAX = 90
+
+# 再試行で回復が見込めるエラーの HTTP ステータスコードとステータス名
+GEMINI_RETRYABLE_CODES = (429, 500, 502, 503, 504)
+GEMINI_RETRYABLE_STATUSES = ("RESOURCE_EXHAUSTED", "INTERNAL", "UNAVAILABLE", "DEADLINE_EXCEEDED")
+# code / status 属性を持たない例外用。メッセージ先頭の「503 UNAVAILABLE」形式だけを見る
+# （本文中の "internal" や "500 tokens" などの無関係な語には反応させない）
+GEMINI_RETRYABLE_MESSAGE_RE = re.compile(
+    r"(?:\d{3} )?(?:" + "|".join(GEMINI_RETRYABLE_STATUSES) + r")\b"
+)
+
+def is_retryable_gemini_error(e):
+    """Gemini の例外が再試行で回復を見込めるもの（レート制限・過負荷・一時的なサーバーエラー）か判定する。
+
+    google-genai の APIError が持つ HTTP ステータスコード（code）・ステータス名（status）で判定し、
+    どちらも持たない例外だけメッセージ先頭のステータス名で判定する。
+    """
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        return code in GEMINI_RETRYABLE_CODES
+    status = getattr(e, "status", None)
+    if isinstance(status, str):
+        return status in GEMINI_RETRYABLE_STATUSES
+    return GEMINI_RETRYABLE_MESSAGE_RE.match(str(e)) is not None
+
 # 1モデルあたりの最大試行回数
 GEMINI_MAX_ATTEMPTS = 4
 
-def summarize(text, api_key, site_type=None):
-    """記事本文を Gemini で日本語要約する。
-
-    処理の流れ:
-      1. モデルリストの先頭（lite）から試行開始
-      2. 失敗が 429/503 の場合: 指数バックオフで待機 → 同モデルで再試行
-      3. GEMINI_MAX_ATTEMPTS 回失敗した場合: 次のモデルへフォールバック
-      4. それ以外のエラー（認証エラー等）: 即座に次のモデルへ
-      5. 全モデル・全試行が失敗した場合: None を返す（呼び出し側がフォールバック処理）
-
-    Args:
-        text: 要約対象の本文（body_trim 済みのもの）
-        api_key: Gemini API キー
-        site_type: サイト種別。"nvd_api" / "jvn" の場合は脆弱性向けプロンプトを使用
+# 複数記事をまとめて 1 リクエストで要約する際の 1 バッチあたりの最大件数。
+# 1 にするとバッチ要約を行わず、従来どおり 1 件ずつ要約する。
+GEMINI_BATCH_SIZE = 5
 
-    Returns:
-        要約文字列（SUMMARY_HARD_LIMIT 文字以内）、または None（全試行失敗時）
+def summary_cache_key(text, site_type=None):
+    """要約キャッシュのキー（サイト種別 + 本文の BLAKE2b 128bit ハッシュ）を返す。
+    NVD は pubStartDate の時間窓が重なると同じ CVE を再配信するため、
+    同一本文の再要約をこのキーで検出する。
     """
-    client = get_gemini_client(api_key)
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{site_type or 'rss'}:{digest}"
+
+def get_cached_summary(cache, text, site_type=None):
+    """要約キャッシュに同一本文の要約が残っていれば返す。なければ None。"""
+    if cache is None:
+        return None
+    cache_key = summary_cache_key(text, site_type)
+    cached = cache.get(cache_key)
+    if cached:
+        logging.info("Gemini summarize cache hit (%s)", cache_key[:24])
+        return cached["summary"]
+    return None
 
-    # サイト種別に応じてプロンプトを切り替え
-    prompt = (
-        # NVD / JVN 向け: 情報が不足していても事実のみ記述、CVE番号は除外
-        """
+def store_cached_summary(cache, text, site_type, summary):
+    """要約結果をキャッシュに登録する（cache が None の場合は何もしない）。"""
+    if cache is not None:
+        cache[summary_cache_key(text, site_type)] = {"summary": summary, "cached_at": isoformat(utc_now())}
+
+# 要約指示文（プロンプトの先頭部分）。呼び出しごとに組み立てず、モジュール定数として保持する。
+# NVD / JVN 向け: 情報が不足していても事実のみ記述、CVE番号は除外
+CVE_SUMMARY_INSTRUCTION = """
 以下の観点がある場合には必ず含めてください。
 ない場合には記事内容の事実のみを日本語95文字以内で要約してください。
 また該当しない場合は文字数削減のため、該当しないことについて言及しないでよいです。
@@ -357,9 +569,9 @@ def summarize(text, api_key, site_type=None):
 - 不明点は「可能性がある」と表現
 - 事実のみ
 """
-        if site_type in ("nvd_api", "jvn")
-        # RSS 向け: 4観点を必ず含める
-        else """
+
+# RSS 向け: 4観点を必ず含める
+RSS_SUMMARY_INSTRUCTION = """
 以下の観点がある場合には必ず含めてください。
 ない場合には記事内容の事実のみを日本語95文字以内で要約してください。
 また該当しない場合は文字数削減のため、該当しないことについて言及しないでよいです。
@@ -370,30 +582,85 @@ def summarize(text, api_key, site_type=None):
 - 攻撃者が可能になる行為
 - 事実のみ、誇張なし
 """
-    ) + f"\n{text}"
+
+def summary_instruction(site_type=None):
+    """サイト種別に応じた要約指示文（プロンプトの先頭部分）を返す。"""
+    return CVE_SUMMARY_INSTRUCTION if site_type in ("nvd_api", "jvn") else RSS_SUMMARY_INSTRUCTION
+
+# ひらがな・カタカナを含む本文は日本語とみなす（JVN の概要など）
+JAPANESE_TEXT_RE = re.compile(r"[\u3040-\u30ff]")
+
+def summary_without_gemini(text, site_type):
+    """Gemini を呼ばずにそのまま要約として使える本文であれば、その本文を返す。
+
+    すでに日本語で SUMMARY_HARD_LIMIT 文字以内に収まっている JVN の概要は、
+    要約しても短くも日本語にもならないため API 呼び出しを省略する。
+    RSS の本文は HTML タグを含むことがあり、そのまま投稿できないため対象外とする。
+    body_trim は英語キーワードで行を選ぶため、判定は前処理前の本文に対して行う。
+    該当しない場合は None を返す（英語の本文は翻訳が必要なため必ず Gemini に渡す）。
+    """
+    if site_type != "jvn":
+        return None
+    text = text.strip()
+    if text and len(text) <= SUMMARY_HARD_LIMIT and JAPANESE_TEXT_RE.search(text):
+        logging.debug("Gemini skipped: short Japanese text (%s chars)", len(text))
+        return text
+    return None
+
+def generate_text(prompt, api_key, label="summarize", config=None):
+    """Gemini にプロンプトを送り、応答テキストを返す。
+
+    処理の流れ:
+      1. モデルリストの先頭（lite）から試行開始
+      2. 失敗が 429/5xx の場合: 指数バックオフ（ジッター付き）で待機 → 同モデルで再試行
+         （429 応答に retryDelay があればその秒数待機。日次クォータ枯渇時は即座に次のモデルへ）
+      3. GEMINI_MAX_ATTEMPTS 回失敗した場合: 次のモデルへフォールバック
+      4. それ以外のエラー（認証エラー等）: 即座に次のモデルへ
+      5. 全モデル・全試行が失敗した場合: None を返す（呼び出し側がフォールバック処理）
+
+    Args:
+        prompt: 送信するプロンプト
+        api_key: Gemini API キー
+        label: ログ出力用の呼び出し元名
+        config: generate_content に渡す生成設定（JSON 出力指定など）
+
+    Returns:
+        応答テキスト（前後の空白除去済み）、または None（全試行失敗時）
+    """
+    client = get_gemini_client(api_key)
 
     # モデルごとに最大 GEMINI_MAX_ATTEMPTS 回試みる。
     # attempt カウンターはモデルをまたぐたびにリセットする。
     # （以前は attempt がリセットされず、2番目のモデルへのフォールバックが機能しないバグがあった）
     for model in GEMINI_MODELS:
+        retry_delay = None  # 直前の 429 応答でサーバーが指定した待機秒数
         for attempt in range(1, GEMINI_MAX_ATTEMPTS + 1):
 
-            # 1回目は短いランダム待機（API への急激な集中を避ける）
+            # 1回目は待機しない（RPM 上限の手前での間隔調整は gemini_rate_limiter が行う）
             # 2回目以降はバックオフテーブルに従って待機秒数を増加
             # RPM 制限（1分15回）が原因のため、短い間隔で再試行するほうが効果的
-            wait = random.uniform(1.0, 2.0) if attempt == 1 else GEMINI_BACKOFF[min(attempt - 2, len(GEMINI_BACKOFF) - 1)]
+            # サーバーが retryDelay を指定していればその秒数だけ待つ
+            if attempt == 1:
+                wait = 0
+            elif retry_delay is not None:
+                wait = retry_delay + 1
+            else:
+                backoff = GEMINI_BACKOFF[min(attempt - 2, len(GEMINI_BACKOFF) - 1)]
+                wait = backoff + random.uniform(0, backoff * GEMINI_BACKOFF_JITTER)
             time.sleep(wait)
+            gemini_rate_limiter.acquire()
 
             try:
                 resp = client.models.generate_content(
                     model=model,
-                    contents=prompt
+                    contents=prompt,
+                    config=config
                 )
-                result = safe_truncate(resp.text.strip(), SUMMARY_HARD_LIMIT)
+                result = resp.text.strip()
 
                 # リトライまたはフォールバックが発生していた場合はログに残す
                 if attempt > 1 or model != GEMINI_MODELS[0]:
-                    logging.info(f"Gemini summarize success (model={model}, attempt={attempt})")
+                    logging.info("Gemini %s success (model=%s, attempt=%s)", label, model, attempt)
                 return result
 
             except Exception as e:
@@ -401,63 +668,330 @@ def summarize(text, api_key, site_type=None):
                 error_type = type(e).__name__
 
                 # エラー種別を分類してログに残す（原因調査用）
-                # - RATE_LIMIT: 429/503/quota/resource_exhausted → リトライで回復が見込める
+                # - RATE_LIMIT: 429/5xx（RESOURCE_EXHAUSTED/UNAVAILABLE 等） → リトライで回復が見込める
                 # - OTHER: 認証エラー・不正リクエスト等 → リトライ不要
-                is_rate_limit = "429" in msg or "503" in msg or "quota" in msg.lower() or "resource_exhausted" in msg.lower()
+                is_rate_limit = is_retryable_gemini_error(e)
 
                 if is_rate_limit:
                     logging.warning(
-                        f"Gemini {model} RATE_LIMIT "
-                        f"(attempt={attempt}/{GEMINI_MAX_ATTEMPTS}, wait={wait:.1f}s) "
-                        f"[{error_type}] {msg[:200]}"
+                        "Gemini %s RATE_LIMIT (attempt=%s/%s, wait=%.1fs) [%s] %s",
+                        model, attempt, GEMINI_MAX_ATTEMPTS, wait, error_type, msg[:200],
                     )
+                    # 1日あたりのクォータ（quotaId に PerDay を含む）は当日中に回復しないため、
+                    # 再試行せず次モデルへ。retryDelay が長すぎる場合も同様に次モデルへ
+                    m = GEMINI_RETRY_DELAY_RE.search(msg)
+                    retry_delay = float(m.group(1)) if m else None
+                    if "PerDay" in msg or (retry_delay is not None and retry_delay > GEMINI_RETRY_DELAY_MAX):
+                        logging.warning("Gemini %s クォータ枯渇 (retryDelay=%s)、次モデルへフォールバック", model, retry_delay)
+                        break
                     if attempt >= GEMINI_MAX_ATTEMPTS:
                         # このモデルの試行上限に達した → for ループを抜けて次モデルへ
                         next_model = GEMINI_MODELS[GEMINI_MODELS.index(model) + 1] if model != GEMINI_MODELS[-1] else "なし"
-                        logging.warning(f"Gemini {model} 全試行失敗、次モデル({next_model})へフォールバック")
+                        logging.warning("Gemini %s 全試行失敗、次モデル(%s)へフォールバック", model, next_model)
                     # attempt ループを継続（次の attempt へ進む、上限なら自動的に次モデルへ）
                 else:
                     # レート制限以外のエラー（認証失敗・不正なリクエスト等）は即座に次モデルへ
                     logging.error(
-                        f"Gemini {model} OTHER_ERROR "
-                        f"(attempt={attempt}) "
-                        f"[{error_type}] {msg[:200]}"
+                        "Gemini %s OTHER_ERROR (attempt=%s) [%s] %s",
+                        model, attempt, error_type, msg[:200],
                     )
                     break  # このモデルの残り試行をスキップして次モデルへ
 
     # 全モデル・全試行失敗 → None を返して呼び出し側でフォールバック処理させる
-    logging.error("Gemini summarize: 全モデル・全試行失敗")
+    logging.error("Gemini %s: 全モデル・全試行失敗", label)
     return None
 
+def summarize(text, api_key, site_type=None, cache=None):
+    """記事本文を Gemini で日本語要約する。
+
+    Args:
+        text: 要約対象の本文（body_trim 済みのもの）
+        api_key: Gemini API キー
+        site_type: サイト種別。"nvd_api" / "jvn" の場合は脆弱性向けプロンプトを使用
+        cache: 要約キャッシュ（load_summary_cache の辞書）。None の場合はキャッシュを使わない
+
+    Returns:
+        要約文字列（SUMMARY_HARD_LIMIT 文字以内）、または None（全試行失敗時）
+    """
+    # 同一本文の要約が残っていれば Gemini を呼ばずに返す
+    cached = get_cached_summary(cache, text, site_type)
+    if cached is not None:
+        return cached
+
+    prompt = "\n".join((summary_instruction(site_type), text))
+    raw = generate_text(prompt, api_key)
+    if raw is None:
+        return None
+
+    result = safe_truncate(raw, SUMMARY_HARD_LIMIT)
+    store_cached_summary(cache, text, site_type, result)
+    return result
+
+# バッチ要約の応答スキーマ。記事番号 i と要約文の組の配列で返させ、
+# 要素の欠落・順番の入れ替わりがあっても記事と要約を取り違えないようにする。
+SUMMARY_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "i": {"type": "INTEGER"},
+            "summary": {"type": "STRING"},
+        },
+        "required": ["i", "summary"],
+    },
+}
+
+def summarize_batch(texts, api_key, site_type=None, cache=None):
+    """複数の記事本文を 1 回の Gemini リクエストでまとめて要約する。
+
+    共通の指示文を 1 度だけ送り、要約を記事番号付きの JSON 配列で返させる。
+    記事ごとに往復するよりリクエスト数・入力トークン数を削減できる。
+    要約は応答の並び順ではなく記事番号で対応付け、番号が欠けた記事だけ
+    1 件ずつの要約（summarize）で補う。
+
+    Returns:
+        要約文字列のリスト（texts と同じ順番）。API が全試行失敗した場合は
+        全要素 None のリスト。応答が JSON 配列として解釈できない場合は None
+        （呼び出し側で 1 件ずつの要約にフォールバックする）。
+    """
+    numbered = "\n\n".join(f"[{i}]\n{t}" for i, t in enumerate(texts, 1))
+    prompt = (
+        summary_instruction(site_type)
+        + f"""
+以下の {len(texts)} 件の記事をそれぞれ上記の指示に従って要約し、
+記事番号 i（[ ] 内の数字）と要約文 summary の組を要素とする JSON 配列で返してください。
+"""
+        + f"\n{numbered}"
+    )
+    raw = generate_text(
+        prompt,
+        api_key,
+        label="summarize_batch",
+        config={"response_mime_type": "application/json", "response_schema": SUMMARY_BATCH_SCHEMA},
+    )
+    if raw is None:
+        return [None] * len(texts)
+
+    try:
+        parsed = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        parsed = None
+    if not isinstance(parsed, list):
+        logging.warning("Gemini summarize_batch: 応答を解釈できないため個別要約へフォールバック (%s)", raw[:200])
+        return None
+
+    # 記事番号 → 要約文。範囲外・型違い・重複した番号は信用せず捨てる
+    by_index = {}
+    duplicated = set()
+    for entry in parsed:
+        if not isinstance(entry, dict):
+            continue
+        i, summary = entry.get("i"), entry.get("summary")
+        if type(i) is not int or not 1 <= i <= len(texts) or not isinstance(summary, str):
+            continue
+        if i in by_index:
+            duplicated.add(i)
+        by_index[i] = summary
+    for i in duplicated:
+        del by_index[i]
+
+    results = []
+    for i, text in enumerate(texts, 1):
+        if i not in by_index:
+            logging.warning("Gemini summarize_batch: 記事 [%s] の要約が応答にないため個別に要約", i)
+            results.append(summarize(text, api_key, site_type, cache=cache))
+            continue
+        result = safe_truncate(by_index[i].strip(), SUMMARY_HARD_LIMIT)
+        store_cached_summary(cache, text, site_type, result)
+        results.append(result)
+    return results
+
+def summarize_items(items, site, gemini_key, cache=None):
+    """サイト単位で取得した記事をまとめて要約する。
+
+    Gemini 呼び出しは 1 件あたり数秒かかるため、投稿ループの前に要約を済ませておく。
+      - JVN の短い日本語の概要（summary_without_gemini）とキャッシュに要約がある記事は Gemini を呼ばない
+      - 残りは GEMINI_BATCH_SIZE 件ずつ summarize_batch でまとめて要約する
+      - バッチ同士は GEMINI_CONCURRENCY 並列で実行する
+    投稿自体はレート制限があるため従来どおり直列で行う。
+
+    Returns:
+        entry_key（CVE ID または URL）→ 要約文字列 or None（失敗時）の辞書
+    """
+    site_type = site["type"]
+    summaries = {}
+    pending = []  # (entry_key, trimmed) のリスト（キャッシュミス分）
+    for item in items:
+        entry_key = item.get("id") or item.get("url")
+        direct = summary_without_gemini(item.get("text", ""), site_type)
+        if direct is not None:
+            summaries[entry_key] = direct
+            continue
+        trimmed = body_trim(item.get("text", ""), site_type=site_type)
+        cached = get_cached_summary(cache, trimmed, site_type)
+        if cached is not None:
+            summaries[entry_key] = cached
+        else:
+            pending.append((entry_key, trimmed))
+
+    if not pending:
+        return summaries
+
+    def _summarize_chunk(chunk):
+        texts = [trimmed for _, trimmed in chunk]
+        results = summarize_batch(texts, gemini_key, site_type, cache=cache) if len(chunk) > 1 else None
+        if results is None:
+            # 1 件のみ、またはバッチ応答が解釈できなかった場合は 1 件ずつ要約する
+            results = [summarize(t, gemini_key, site_type, cache=cache) for t in texts]
+        return results
+
+    chunks = [pending[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(pending), GEMINI_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=GEMINI_CONCURRENCY) as ex:
+        for chunk, results in zip(chunks, ex.map(_summarize_chunk, chunks)):
+            for (entry_key, _), summary in zip(chunk, results):
+                summaries[entry_key] = summary
+
+    return summaries
+
 
 # =========================================================
 # データ取得（RSS / NVD API / JVN）
 # =========================================================
 
-def fetch_rss(site, since=None, until=None):
+# 1 回の実行内でパース済みのフィードを URL ごとに保持する。
+# 通常取得と retry 再取得で同じフィードを何度もダウンロード・パースしないようにする。
+# 並列取得時に同じ URL を同時にパースしないよう、URL ごとのロックで保護する。
+_feed_cache = {}
+_feed_cache_lock = threading.Lock()
+
+def parse_feed(url, validators=None):
+    """RSS / Atom フィードを取得・パースする（feedparser は初回呼び出し時に import）。
+
+    validators（前回の {"etag", "modified"}）を渡した場合は条件付き GET を行う。
+    条件付き GET の結果は呼び出し元のサイト専用のため共有しない。
+    検証子なしの取得は、同じ URL につき 1 回の実行で 1 度だけパースし、以降はその結果を返す
+    （通常取得と retry 再取得で同じフィードを何度もダウンロードしない）。
+
+    Returns:
+        (feed, new_validators) のタプル。new_validators は次回の条件付き GET に使う検証子
+        （更新不要・取得失敗時は validators をそのまま返す）
+    """
+    if validators:
+        return _download_and_parse_feed(url, validators)
+    with _feed_cache_lock:
+        cached = _feed_cache.setdefault(url, {"lock": threading.Lock(), "result": None})
+    with cached["lock"]:
+        if cached["result"] is None:
+            cached["result"] = _download_and_parse_feed(url)
+    return cached["result"]
+
+def _download_and_parse_feed(url, validators=None):
+    """フィードを http_session でダウンロードし、取得済みの bytes を feedparser でパースする。
+
+    feedparser 自身のダウンロード（urllib）は keep-alive もリトライもないため、
+    共有セッションで取得してからパースだけを feedparser に任せる。
+    前回の ETag / Last-Modified があれば条件付き GET を行い、304（更新なし）の場合は
+    ダウンロードとパースを省いてエントリなしのフィードを返す。
+    取得に失敗した場合も従来の feedparser と同様にエントリなしのフィードを返す。
+
+    Returns:
+        (feed, new_validators) のタプル（parse_feed と同じ）
+    """
+    import feedparser
+    request_headers = {}
+    if validators and validators.get("etag"):
+        request_headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("modified"):
+        request_headers["If-Modified-Since"] = validators["modified"]
+    try:
+        resp = http_session.get(url, headers=request_headers, timeout=30)
+        if resp.status_code == 304:
+            logging.info("Feed not modified: %s", url)
+            return feedparser.parse(b""), validators
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        logging.warning("Feed download failed: %s: %s", url, e)
+        return feedparser.parse(b""), validators
+
+    new_validators = {
+        key: value
+        for key, value in (("etag", resp.headers.get("ETag")), ("modified", resp.headers.get("Last-Modified")))
+        if value
+    }
+
+    # Content-Type（文字コード判定）と Content-Location（リンク URL の解決）を引き継ぐ
+    headers = {k.lower(): v for k, v in resp.headers.items()}
+    headers.setdefault("content-location", resp.url)
+    # 本文 HTML 内の相対 URL の書き換えは使わないため無効にする（エントリのリンク自体は解決される）。
+    # HTML のサニタイズは script / style の中身を Gemini に送らないために残す
+    feed = feedparser.parse(resp.content, response_headers=headers, resolve_relative_uris=False)
+    return feed, new_validators
+
+def fetch_rss(site, since=None, until=None, validators=None):
     """RSS フィードから新着記事を取得する。
 
     since〜until の時間窓に含まれる記事のみ返す。
     max_items で取得上限を設定（未指定時は 1 件）。
+    新しい順のフィードでは since 以前の記事に達した時点で走査を打ち切る。
+    validators を渡した場合は条件付き GET を行う（parse_feed 参照）。
 
     Returns:
-        記事の辞書リスト。各辞書は {id, text, url} を持つ。
+        (items, new_validators) のタプル。items は記事の辞書リストで、各辞書は {id, text, url} を持つ。
     """
-    feed = feedparser.parse(site["url"])
+    feed, new_validators = parse_feed(site["url"], validators)
     items = []
+
+    # 時間窓の比較はエポック秒同士で行い、記事ごとの datetime 生成を省く
+    in_window = since and until
+    if in_window:
+        since_ts, until_ts = since.timestamp(), until.timestamp()
+    # RSS は通常新しい順に並ぶため、since 以前の記事が出たら以降は全て古い
+    # （並び順が保証されないフィードは feed_sorted: false で無効化する）
+    feed_sorted = site.get("feed_sorted", True)
+
     for entry in feed.entries[: site.get("max_items", 1)]:
         published = entry.get("published_parsed")
-        if published and since and until:
-            entry_time = datetime.fromtimestamp(time.mktime(published), tz=timezone.utc)
+        if published and in_window:
+            # feedparser の *_parsed は UTC の struct_time なので timegm で変換する
+            # （mktime はローカル時刻として解釈するため、UTC 以外の環境でずれる）
+            entry_ts = calendar.timegm(published)
             # 時間窓外の記事はスキップ
-            if not (since < entry_time <= until):
+            if entry_ts > until_ts:
+                continue
+            if entry_ts <= since_ts:
+                if feed_sorted:
+                    break
                 continue
         items.append({
             "id": entry.get("link"),   # RSS ではリンク URL を ID として使用
             "text": f"{entry.get('title','')}\n{entry.get('summary','')}",
             "url": entry.get("link"),
         })
-    return items
+    return items, new_validators
+
+# CVSS スコアを探すメトリクスキー（優先順位順: v3.1 → v3.0 → v2）
+CVSS_METRIC_KEYS = ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2")
+
+def extract_cvss_score(metrics):
+    """NVD の metrics から CVSS 基本スコアを取り出す。
+    CVSS_METRIC_KEYS の優先順位で最初に見つかったものを使い、なければ 0 を返す。
+    """
+    for key in CVSS_METRIC_KEYS:
+        entries = metrics.get(key)
+        if entries:
+            return float(entries[0]["cvssData"]["baseScore"])
+    return 0
+
+def build_nvd_item(cid, score, cve):
+    """NVD の CVE オブジェクトから記事辞書 {id, score, text, url} を組み立てる。"""
+    # 英語の説明文（descriptions の先頭）を本文として使用
+    desc = cve.get("descriptions", [{}])[0].get("value", "")
+    return {
+        "id": cid,
+        "score": score,
+        "text": desc,
+        "url": f"https://nvd.nist.gov/vuln/detail/{cid}"
+    }
 
 def fetch_nvd(site, start, end):
     """NVD（米国国家脆弱性データベース）API から CVE 情報を取得する。
@@ -465,84 +999,112 @@ def fetch_nvd(site, start, end):
     pubStartDate〜pubEndDate の範囲で公開された CVE を取得し、
     cvss_threshold 以上のスコアのものだけ返す。
 
+    レスポンス全体を resp.json() で展開せず、ijson で vulnerabilities[].cve を
+    1 件ずつストリーム解析する。閾値未満の CVE はその場で捨てるため、
+    resultsPerPage が大きくてもメモリ使用量は CVE 1 件分に収まる。
+
     Raises:
         RuntimeError: 429（レート制限）の場合。呼び出し側でサイトごとスキップする。
     """
     url = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+    max_items = site.get("max_items", 50)
     params = {
-        "resultsPerPage": site.get("max_items", 50),
+        "resultsPerPage": max_items,
         "pubStartDate": isoformat(start),
         "pubEndDate": isoformat(end),
     }
-    resp = requests.get(url, params=params, timeout=30)
-
-    # NVD は無料利用時にレート制限が厳しい。429 は次回実行に持ち越す
-    if resp.status_code == 429:
-        raise RuntimeError("NVD API rate limited (429)")
-    resp.raise_for_status()
-
-    data = resp.json()
     threshold = float(site.get("cvss_threshold", 0))
+    with http_session.get(url, params=params, timeout=30, stream=True) as resp:
+        # NVD は無料利用時にレート制限が厳しい。429 は次回実行に持ち越す
+        if resp.status_code == 429:
+            raise RuntimeError("NVD API rate limited (429)")
+        resp.raise_for_status()
+
+        # gzip 等の Content-Encoding を展開した状態で ijson に渡す
+        resp.raw.decode_content = True
+        items = _parse_nvd_stream(resp.raw, threshold)
+    return items
+
+def _parse_nvd_stream(stream, threshold):
+    """NVD API のレスポンスストリームから閾値以上の CVE を抽出する。
+    件数の上限はリクエストの resultsPerPage で指定済みのため、ここでは打ち切らない。
+    """
     items = []
-    for v in data.get("vulnerabilities", []):
-        cve = v.get("cve", {})
+    # vulnerabilities[].cve を直接取り出し、外側のラッパー dict は組み立てない
+    for cve in ijson.items(stream, "vulnerabilities.item.cve", use_float=True):
         cid = cve.get("id")
-        metrics = cve.get("metrics", {})
-
-        # CVSS スコアは v3.1 → v3.0 → v2 の優先順位で取得
-        score = 0
-        for key in ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
-            if key in metrics:
-                score = float(metrics[key][0]["cvssData"]["baseScore"])
-                break
+        score = extract_cvss_score(cve.get("metrics", {}))
 
         # CVE ID がない or スコアが閾値未満はスキップ
         if not cid or score < threshold:
             continue
 
-        # 英語の説明文（descriptions の先頭）を本文として使用
-        desc = cve.get("descriptions", [{}])[0].get("value", "")
-        items.append({
-            "id": cid,
-            "score": score,
-            "text": desc,
-            "url": f"https://nvd.nist.gov/vuln/detail/{cid}"
-        })
+        items.append(build_nvd_item(cid, score, cve))
     return items
 
-def fetch_jvn(site, since, until):
+def fetch_jvn(site, since, until, validators=None):
     """JVN（Japan Vulnerability Notes）の RSS フィードから CVE 情報を取得する。
 
     RSS エントリのタグから CVE ID を抽出し、since〜until の時間窓内のものだけ返す。
     CVE タグが付いていないエントリはスキップする（JVN 固有 ID のみの記事を除外）。
+    validators を渡した場合は条件付き GET を行う（parse_feed 参照）。
 
     Returns:
-        記事の辞書リスト（max_items 件まで）
+        (items, new_validators) のタプル。items は記事の辞書リスト（max_items 件まで）
     """
-    feed = feedparser.parse(site["url"])
+    feed, new_validators = parse_feed(site["url"], validators)
+    max_items = site.get("max_items", 1)
     items = []
     for entry in feed.entries:
+        # max_items 件そろったら残りのエントリは見ない（本文の組み立ても省く）
+        if len(items) >= max_items:
+            break
+
         # 公開日時のないエントリはスキップ
         if not entry.get("published_parsed"):
             continue
 
-        entry_time = datetime.fromtimestamp(time.mktime(entry.published_parsed), tz=timezone.utc)
+        # feedparser の *_parsed は UTC の struct_time なので timegm で変換する
+        entry_time = datetime.fromtimestamp(calendar.timegm(entry.published_parsed), tz=timezone.utc)
         if not (since < entry_time <= until):
             continue
 
-        # エントリのタグから CVE ID（"CVE-" で始まるもの）を抽出
-        cve_ids = [t for t in entry.get("tags", []) if t.get("term", "").startswith("CVE-")]
-        if not cve_ids:
+        # エントリのタグから CVE ID（"CVE-" で始まるもの）を探す
+        # 複数の CVE が紐づく場合は先頭の CVE ID を代表として使用するため、最初の 1 件で打ち切る
+        cve_id = next((t["term"] for t in entry.get("tags", []) if t.get("term", "").startswith("CVE-")), None)
+        if cve_id is None:
             continue  # CVE タグなしはスキップ
 
-        # 複数の CVE が紐づく場合は先頭の CVE ID を代表として使用
         items.append({
-            "id": cve_ids[0]["term"],
+            "id": cve_id,
             "score": site.get("default_cvss", 0),  # JVN は CVSS スコアを API では返さないため設定値を使用
             "text": entry.get("summary", ""),
             "url": entry.get("link")
         })
-    return items[: site.get("max_items", 1)]
+    return items, new_validators
+
+
+def fetch_items(site, since, until, validators=None):
+    """サイト種別に応じたフェッチ関数を呼び出して新着記事を返す。
+
+    state を変更しない純粋な取得処理のため、サイトをまたいで並列実行できる。
+    validators はフィード（RSS / JVN）の条件付き GET 用の前回の検証子。
+    新しい検証子は state に書き込まずに返し、保存のタイミングは呼び出し側が決める。
+
+    Returns:
+        (items, new_validators) のタプル。items は記事の辞書リスト、
+        または None（未対応のサイト種別）。new_validators はフィード以外では None
+
+    Raises:
+        RuntimeError: NVD 429 等、フェッチレベルの失敗
+    """
+    if site["type"] == "rss":
+        return fetch_rss(site, since, until, validators)
+    elif site["type"] == "nvd_api":
+        return fetch_nvd(site, since, until), None
+    elif site["type"] in ("jvn", "jvn_rss"):
+        return fetch_jvn(site, since, until, validators)
+    return None, None
 
 
 # =========================================================
@@ -567,7 +1129,7 @@ def fetch_item_for_retry(entry_key, site, site_state):
     if site_type == "rss":
         try:
             url = entry_key  # RSS の entry_key は記事 URL
-            feed = feedparser.parse(site["url"])
+            feed, _ = parse_feed(site["url"])
             for entry in feed.entries:
                 if entry.get("link") == url:
                     return {
@@ -576,24 +1138,24 @@ def fetch_item_for_retry(entry_key, site, site_state):
                         "url": url,
                     }
             # フィードから記事が消えていた場合（期限切れ等）
-            logging.warning(f"retry fetch (rss): {url} not found in feed")
+            logging.warning("retry fetch (rss): %s not found in feed", url)
             return None
         except Exception as e:
-            logging.warning(f"retry fetch (rss) failed for {entry_key}: {e}")
+            logging.warning("retry fetch (rss) failed for %s: %s", entry_key, e)
             return None
 
     # --- NVD: CVE ID を指定して API を直接叩く ---
     elif site_type == "nvd_api":
         try:
             cve_id = entry_key
-            resp = requests.get(
+            resp = http_session.get(
                 "https://services.nvd.nist.gov/rest/json/cves/2.0",
                 params={"cveId": cve_id},
                 timeout=30
             )
             if resp.status_code == 429:
                 # レート制限中は次回に持ち越し
-                logging.warning(f"NVD API 429 on retry fetch for {cve_id}")
+                logging.warning("NVD API 429 on retry fetch for %s", cve_id)
                 return None
             resp.raise_for_status()
 
@@ -602,28 +1164,17 @@ def fetch_item_for_retry(entry_key, site, site_state):
                 return None
 
             cve = vulns[0].get("cve", {})
-            metrics = cve.get("metrics", {})
-            score = 0
-            for key in ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
-                if key in metrics:
-                    score = float(metrics[key][0]["cvssData"]["baseScore"])
-                    break
-            desc = cve.get("descriptions", [{}])[0].get("value", "")
-            return {
-                "id": cve_id,
-                "score": score,
-                "text": desc,
-                "url": f"https://nvd.nist.gov/vuln/detail/{cve_id}"
-            }
+            score = extract_cvss_score(cve.get("metrics", {}))
+            return build_nvd_item(cve_id, score, cve)
         except Exception as e:
-            logging.warning(f"retry fetch (nvd) failed for {entry_key}: {e}")
+            logging.warning("retry fetch (nvd) failed for %s: %s", entry_key, e)
             return None
 
     # --- JVN: RSS を再パースして CVE ID で突合 ---
     elif site_type in ("jvn", "jvn_rss"):
         try:
             cve_id = entry_key
-            feed = feedparser.parse(site["url"])
+            feed, _ = parse_feed(site["url"])
             for entry in feed.entries:
                 cve_ids = [t.get("term") for t in entry.get("tags", []) if t.get("term", "").startswith("CVE-")]
                 if cve_id in cve_ids:
@@ -633,10 +1184,10 @@ def fetch_item_for_retry(entry_key, site, site_state):
                         "text": entry.get("summary", ""),
                         "url": entry.get("link")
                     }
-            logging.warning(f"retry fetch (jvn): {cve_id} not found in feed")
+            logging.warning("retry fetch (jvn): %s not found in feed", cve_id)
             return None
         except Exception as e:
-            logging.warning(f"retry fetch (jvn) failed for {entry_key}: {e}")
+            logging.warning("retry fetch (jvn) failed for %s: %s", entry_key, e)
             return None
 
     # 未対応のサイト種別
@@ -647,11 +1198,89 @@ def fetch_item_for_retry(entry_key, site, site_state):
 # Bluesky 投稿
 # =========================================================
 
-def post_bluesky(client, text, url):
+def download_limited(url, max_bytes):
+    """URL の内容を max_bytes 未満に収まる場合のみダウンロードして返す。
+
+    Content-Length で上限以上とわかる場合は本文を読まずに打ち切り、
+    ヘッダがない場合もストリームで読みながら上限に達した時点で中断する。
+    大きすぎる画像を丸ごとダウンロードしてから捨てる無駄を避ける。
+
+    Returns:
+        取得した bytes、または None（取得失敗・上限超過時）
+    """
+    with http_session.get(url, timeout=10, stream=True) as resp:
+        if resp.status_code != 200:
+            return None
+        content_length = resp.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) >= max_bytes:
+            return None
+
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size >= max_bytes:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+def fetch_link_card(url):
+    """リンクカード（embed）用の OGP 情報とサムネイル画像を取得する。
+
+    cardyb.bsky.app で URL の OGP 情報（タイトル・説明・サムネイル URL）を取得し、
+    サムネイル画像があればダウンロードする。
+    Bluesky クライアントを使わないため、投稿前にスレッドで並列取得できる。
+
+    サムネイル画像の条件:
+      取得成功 かつ THUMBNAIL_MAX_BYTES（1MB）未満の場合のみ採用（大きすぎる画像は除外）。
+
+    Returns:
+        {"title": str, "description": str, "image": bytes or None}
+    """
+    # OGP 情報取得
+    resp = http_session.get("https://cardyb.bsky.app/v1/extract", params={"url": url}, timeout=10)
+    card = resp.json()
+
+    # サムネイル画像のダウンロード（存在する場合のみ）
+    image = None
+    image_url = card.get("image")
+    if image_url:
+        image = download_limited(image_url, THUMBNAIL_MAX_BYTES)
+
+    return {
+        "title": card.get("title", ""),
+        "description": card.get("description", ""),
+        "image": image,
+    }
+
+def prefetch_link_cards(urls):
+    """複数 URL のリンクカードを並列に取得する。
+
+    投稿ループはレート制御付きの直列処理のため、OGP・サムネイル取得を
+    事前にまとめて済ませておく。取得に失敗した URL は None とし、
+    post_bluesky 側で改めて取得を試みる。
+
+    Returns:
+        URL → fetch_link_card の結果 or None の辞書
+    """
+    def _fetch(url):
+        try:
+            return fetch_link_card(url)
+        except Exception as e:
+            logging.warning("Link card prefetch failed: %s: %s", url, e)
+            return None
+
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=CARD_FETCH_CONCURRENCY) as ex:
+        return dict(zip(urls, ex.map(_fetch, urls)))
+
+def post_bluesky(client, text, url, link_card=None):
     """Bluesky にリンクカード（embed）付きで投稿する。
 
     処理の流れ:
-      1. cardyb.bsky.app で URL の OGP 情報（タイトル・説明・サムネイル）を取得
+      1. リンクカード情報を取得（prefetch_link_cards で取得済みならそれを使う）
       2. サムネイル画像を Bluesky にアップロードして blob を取得
       3. embed オブジェクトを組み立てて投稿
 
@@ -659,55 +1288,143 @@ def post_bluesky(client, text, url):
       テキスト + URL の文字列投稿にフォールバックする。
       テキスト投稿も失敗した場合は例外を呼び出し元に伝播させ、
       process_item 内で retry_ids に登録させる。
-
-    サムネイル画像の条件:
-      取得成功 かつ 1MB 未満の場合のみアップロード（大きすぎる画像は除外）。
     """
+    from atproto import models
+
     try:
-        # OGP 情報取得
-        resp = requests.get("https://cardyb.bsky.app/v1/extract", params={"url": url}, timeout=10)
-        card = resp.json()
+        if link_card is None:
+            link_card = fetch_link_card(url)
 
         # サムネイル画像のアップロード（存在する場合のみ）
         image_blob = None
-        image_url = card.get("image")
-        if image_url:
-            img = requests.get(image_url, timeout=10)
-            if img.status_code == 200 and len(img.content) < 1_000_000:
-                upload = client.upload_blob(img.content)
-                image_blob = upload.blob
+        if link_card["image"]:
+            upload = client.upload_blob(link_card["image"])
+            image_blob = upload.blob
 
         # embed オブジェクトを組み立てて投稿
         embed = models.AppBskyEmbedExternal.Main(
             external=models.AppBskyEmbedExternal.External(
                 uri=url,
-                title=card.get("title", ""),
-                description=card.get("description", ""),
+                title=link_card["title"],
+                description=link_card["description"],
                 thumb=image_blob
             )
         )
         client.send_post(text=text, embed=embed)
 
     except Exception as embed_err:
+        # レート制限（429）の場合はテキスト投稿も同じく拒否されるため、
+        # フォールバックせずに post_bluesky_with_backoff へ伝播させる
+        if bluesky_rate_limit_wait(embed_err) is not None:
+            raise
         # embed 付き投稿が失敗した場合はテキスト投稿にフォールバック
         # （embed の失敗自体は retry 不要なためここで飲み込む）
-        logging.warning(f"Embed failed, fallback to text post: {embed_err}")
+        logging.warning("Embed failed, fallback to text post: %s", embed_err)
         # テキスト投稿が失敗した場合は例外を外に伝播させる（retry_ids 登録のため）
         client.send_post(text=text + f"\n{url}")
 
+def bluesky_rate_limit_wait(e):
+    """Bluesky のレート制限（429）による例外であれば、再試行までに待つ秒数を返す。
+
+    atproto の例外は応答を response 属性に持つ。ratelimit-reset（制限が解除される UNIX 時刻）、
+    retry-after（秒数）の順に待機時間を決め、どちらもなければ POST_429_DEFAULT_WAIT 秒とする。
+    429 以外の例外の場合は None を返す。
+    """
+    response = getattr(e, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    headers = {str(k).lower(): v for k, v in (getattr(response, "headers", None) or {}).items()}
+    try:
+        if headers.get("ratelimit-reset"):
+            return max(float(headers["ratelimit-reset"]) - time.time(), 0) + 1
+        if headers.get("retry-after"):
+            return max(float(headers["retry-after"]), 0)
+    except ValueError:
+        pass
+    return POST_429_DEFAULT_WAIT
+
+def post_bluesky_with_backoff(client, text, url, link_card=None):
+    """post_bluesky を呼び、Bluesky が 429 を返した場合は制限解除まで待って再試行する。
+
+    待機時間が POST_429_WAIT_MAX を超える場合や、POST_429_RETRY_MAX 回再試行しても
+    429 が続く場合は例外をそのまま伝播させる（process_item が retry_ids に登録し、次回実行で再試行する）。
+    """
+    for attempt in range(POST_429_RETRY_MAX + 1):
+        try:
+            return post_bluesky(client, text, url, link_card=link_card)
+        except Exception as e:
+            wait = bluesky_rate_limit_wait(e)
+            if wait is None or wait > POST_429_WAIT_MAX or attempt == POST_429_RETRY_MAX:
+                raise
+            logging.warning("Bluesky rate limited (429), %.0f 秒待機して再試行 (%s/%s)", wait, attempt + 1, POST_429_RETRY_MAX)
+            time.sleep(wait)
+
+
+# =========================================================
+# Bluesky 投稿レート制御
+# =========================================================
+
+class RateLimiter:
+    """直近 window 秒間の実行回数を数え、上限に達したときだけ待機するレート制御。
+
+    以前は投稿ごとに一律 30〜90 秒待機していたが、上限に余裕がある間は
+    待たずに実行し、上限に達した場合のみ最も古い実行が時間窓から外れるまで待つ。
+    時刻は time.monotonic() で計測する（システム時刻の変更に影響されない）。
+    Gemini の並列要約など複数スレッドから使うため、状態の更新はロックで保護する。
+    """
+
+    def __init__(self, limit, window, name):
+        self.limit = limit
+        self.window = window
+        self.name = name  # ログ出力用
+        self.called_at = deque()  # 時間窓内の実行時刻（monotonic 秒、古い順）
+        self.lock = threading.Lock()
+
+    def _wait_locked(self):
+        now = time.monotonic()
+        while self.called_at and self.called_at[0] <= now - self.window:
+            self.called_at.popleft()
+        if len(self.called_at) >= self.limit:
+            wait = self.called_at[0] + self.window - now
+            logging.info("%s が上限 (%s回/%s秒) に達したため %.1f 秒待機", self.name, self.limit, self.window, wait)
+            time.sleep(wait)
+            self.called_at.popleft()
+
+    def wait(self):
+        """次の実行が上限を超える場合、実行可能になるまで待機する。"""
+        with self.lock:
+            self._wait_locked()
+
+    def record(self):
+        """実行した時刻を記録する。"""
+        with self.lock:
+            self.called_at.append(time.monotonic())
+
+    def acquire(self):
+        """wait と record をまとめて行う（並列実行時に枠を取り合わないよう 1 つのロック内で行う）。"""
+        with self.lock:
+            self._wait_locked()
+            self.called_at.append(time.monotonic())
+
+# 全サイト共通の投稿レート制御（サイトをまたいで投稿数を数える）
+post_rate_limiter = RateLimiter(POST_RATE_LIMIT, POST_RATE_WINDOW, "Bluesky 投稿数")
+
+# Gemini 呼び出しのレート制御（429 を受けてから待つのではなく、RPM 上限の手前で自ら間隔を空ける）
+gemini_rate_limiter = RateLimiter(GEMINI_RPM_LIMIT, 60, "Gemini リクエスト数")
+
 
 # =========================================================
 # 記事1件を処理する共通関数（通常投稿 / retry 共用）
 # =========================================================
 
-def process_item(item, site, site_state, state, now, MODE, force_test, gemini_key, bsky_client, is_retry=False):
+def process_item(item, site, site_state, state, now, MODE, force_test, gemini_key, bsky_client, is_retry=False, summaries=None, formatter=None, summary_cache=None, link_cards=None, known_cve_index=None):
     """1件の記事を要約して Bluesky に投稿し、結果を state に記録する。
 
     通常投稿（STEP 2）とリトライ投稿（STEP 1）の両方で使用する共通関数。
 
     処理の流れ:
       1. CVE 横断重複チェック（NVD/JVN のみ）
-      2. 本文を前処理（body_trim）
+      2. 本文を前処理（body_trim、Gemini を呼ぶ場合のみ）
       3. Gemini で要約（force_test 時はスキップ）
       4. 投稿テキストを組み立て（format_post）
       5. Bluesky に投稿（test モード時はログ出力のみ）
@@ -717,20 +1434,33 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
       「要約生成に失敗したため…」の固定文で投稿し、
       GEMINI_RETRY_MAX 回までは retry_ids に登録して次回再要約を試みる。
 
+    formatter には make_formatter(site) で生成したサイト専用の整形関数を渡す
+    （未指定時はその場で生成する）。
+
+    link_cards に投稿 URL が含まれる場合は、prefetch_link_cards で事前に
+    取得したリンクカード情報を使って投稿する。
+
+    summaries に entry_key が含まれる場合は、summarize_items で事前に
+    並列要約した結果を使い、Gemini を再度呼び出さない。
+
+    known_cve_index には build_known_cve_index で作った集合を渡す
+    （CVE 横断重複チェックに使い、投稿成功時に CVE ID を追加する）。
+
     Returns:
         "success" | "failed" | "skipped"
     """
     cid = item.get("id")
     entry_key = cid or item.get("url")  # CVE ID または URL を一意キーとして使用
+    now_iso = isoformat(now)            # state に記録する時刻文字列（1 回だけ生成して使い回す）
     label = "[再投稿]" if is_retry else ""
 
     # --- 1. CVE 横断重複チェック ---
     # NVD と JVN は同じ CVE を掲載するため、どちらかで投稿済みならスキップ
-    if site["type"] in ("nvd_api", "jvn") and is_cve_already_posted(cid, site["type"], state):
-        logging.info(f"[{site['type']}] {cid} は既投稿のためスキップ (known_cve)")
+    if site["type"] in ("nvd_api", "jvn") and is_cve_already_posted(cid, site["type"], state, known_cve_index):
+        logging.info("[%s] %s は既投稿のためスキップ (known_cve)", site['type'], cid)
         site_state["entries"].setdefault(entry_key, {}).update({
             "status": "skipped",
-            "last_tried_at": isoformat(now),
+            "last_tried_at": now_iso,
             "reason": "known_cve",
         })
         # retry_ids に残っていた場合は除去（重複スキップなので再試行不要）
@@ -738,36 +1468,42 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
             site_state["retry_ids"].remove(entry_key)
         return "skipped"
 
-    # --- 2. 本文前処理 ---
     original_text = item.get("text", "")
-    trimmed = body_trim(original_text, site_type=site["type"])
     post_url = item.get("url", "")
 
-    # --- 3. Gemini 要約 ---
+    # --- 2〜3. 本文前処理 + Gemini 要約 ---
+    # body_trim は Gemini に渡す場合にのみ必要なため、要約を呼び出す直前で行う
     if force_test:
-        # テスト用設定: Gemini API を呼ばず本文の先頭を使う
-        summary = trimmed[:SUMMARY_HARD_LIMIT]
+        # テスト用設定: Gemini API を呼ばず本文の先頭をそのまま使う（body_trim も省略）
+        summary = original_text[:SUMMARY_HARD_LIMIT]
         gemini_failed = False
     else:
-        summary = summarize(trimmed, gemini_key, site["type"])
+        if summaries is not None and entry_key in summaries:
+            summary = summaries[entry_key]
+        else:
+            summary = summary_without_gemini(original_text, site["type"])
+            if summary is None:
+                trimmed = body_trim(original_text, site_type=site["type"])
+                summary = summarize(trimmed, gemini_key, site["type"], cache=summary_cache)
         gemini_failed = (summary is None)
         if gemini_failed:
             # 全試行失敗時はフォールバック文で投稿し、次回再要約を試みる
             summary = "要約生成に失敗したため、脆弱性の存在のみ通知します。"
-            logging.warning(f"[{site.get('display_name', site['type'])}] Gemini要約失敗、フォールバック投稿: {entry_key}")
+            logging.warning("[%s] Gemini要約失敗、フォールバック投稿: %s", site.get('display_name', site['type']), entry_key)
 
     # --- 4. 投稿テキスト組み立て ---
-    post_text = format_post(site, summary, item)
+    post_text = (formatter or make_formatter(site))(summary, item)
 
     # --- 5. Bluesky 投稿 ---
     try:
         if MODE == "test":
             # test モードは実際には投稿せず、内容をログ出力するだけ
-            logging.info(f"[TEST]{label}\n{post_text}")
+            logging.info("[TEST]%s\n%s", label, post_text)
         else:
-            post_bluesky(bsky_client, post_text, post_url)
-            # 連続投稿によるレート制限を避けるためランダムに待機（30〜90秒）
-            time.sleep(random.randint(30, 90))
+            # 連続投稿によるレート制限を避けるため、上限に達している場合のみ待機
+            post_rate_limiter.wait()
+            post_bluesky_with_backoff(bsky_client, post_text, post_url, link_card=(link_cards or {}).get(post_url))
+            post_rate_limiter.record()
 
         # --- 6a. 投稿成功時の state 更新 ---
         current_retry_count = site_state["entries"].get(entry_key, {}).get("retry_count", 0)
@@ -777,12 +1513,15 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
             new_retry_count = current_retry_count + 1
             final_status = "fallback"
             if new_retry_count <= GEMINI_RETRY_MAX:
-                logging.info(f"[{site.get('display_name', site['type'])}] フォールバック投稿成功、次回再要約登録 (retry_count={new_retry_count}): {entry_key}")
+                logging.info(
+                    "[%s] フォールバック投稿成功、次回再要約登録 (retry_count=%s): %s",
+                    site.get("display_name", site["type"]), new_retry_count, entry_key,
+                )
                 if entry_key not in set(site_state.get("retry_ids", [])):
                     site_state.setdefault("retry_ids", []).append(entry_key)
             else:
                 # 再要約の上限に達したので retry_ids には登録しない（以降はスキップ）
-                logging.info(f"[{site.get('display_name', site['type'])}] retry上限到達、retry_ids登録なし: {entry_key}")
+                logging.info("[%s] retry上限到達、retry_ids登録なし: %s", site.get('display_name', site['type']), entry_key)
         else:
             # 通常要約投稿成功（または retry で要約成功）: retry_ids から除去して完了扱い
             new_retry_count = current_retry_count
@@ -793,12 +1532,12 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
         # エントリの状態を更新
         entry = site_state["entries"].setdefault(entry_key, {})
         entry.update({
-            "status": final_status,                                          # success / fallback
-            "first_seen_at": entry.get("first_seen_at", isoformat(now)),     # 初回取得日時（上書きしない）
-            "last_tried_at": isoformat(now),                                 # 最終試行日時
-            "reason": "gemini_failed" if gemini_failed else "",              # 失敗理由（あれば）
-            "retry_count": new_retry_count,                                  # 累積リトライ回数
-            "posted_at": isoformat(now),                                     # 投稿完了日時
+            "status": final_status,                                  # success / fallback
+            "first_seen_at": entry.get("first_seen_at", now_iso),    # 初回取得日時（上書きしない）
+            "last_tried_at": now_iso,                                # 最終試行日時
+            "reason": "gemini_failed" if gemini_failed else "",      # 失敗理由（あれば）
+            "retry_count": new_retry_count,                          # 累積リトライ回数
+            "posted_at": now_iso,                                    # 投稿完了日時
             "url": post_url,
             "score": item.get("score", 0),
         })
@@ -806,27 +1545,28 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
         # NVD / JVN で要約成功した場合のみ known_cves に登録して横断重複防止
         # （fallback 投稿では次回再投稿するため、まだ完了扱いにしない）
         if site["type"] in ("nvd_api", "jvn") and cid and not gemini_failed:
-            if cid not in site_state.get("known_cves", []):
-                site_state.setdefault("known_cves", []).append(cid)
-            site_state["posted_ids"][cid] = isoformat(now)
-            # posted_ids が膨らんだら古いものを削除
-            pruned = prune_posted_ids(site_state["posted_ids"], now)
-            if pruned > 0:
-                logging.info(f"posted_ids prune: {pruned} 件削除 ({site_key})")
+            known_cves = site_state.setdefault("known_cves", [])
+            if known_cve_index is not None:
+                known_cve_index.add(cid)
+            # known_cves は件数で切り詰めない（NVD で投稿済みの CVE が数週間後に JVN に
+            # 掲載されることがあり、古い ID を捨てると重複投稿になるため）
+            if cid not in known_cves:
+                known_cves.append(cid)
+            site_state["posted_ids"][cid] = now_iso
 
         log_label = "[フォールバック]" if gemini_failed else ""
-        logging.info(f"[{site.get('display_name', site['type'])}]{label}{log_label} 投稿成功: {entry_key}")
+        logging.info("[%s]%s%s 投稿成功: %s", site.get('display_name', site['type']), label, log_label, entry_key)
         return "success"
 
     except Exception as e:
         # --- 6b. 投稿失敗時の state 更新 ---
         retry_count = site_state["entries"].get(entry_key, {}).get("retry_count", 0) + 1
-        logging.warning(f"[{site.get('display_name', site['type'])}]{label} 投稿失敗 (retry_count={retry_count}): {e}")
+        logging.warning("[%s]%s 投稿失敗 (retry_count=%s): %s", site.get('display_name', site['type']), label, retry_count, e)
 
         site_state["entries"].setdefault(entry_key, {}).update({
             "status": "failed",
-            "first_seen_at": site_state["entries"].get(entry_key, {}).get("first_seen_at", isoformat(now)),
-            "last_tried_at": isoformat(now),
+            "first_seen_at": site_state["entries"].get(entry_key, {}).get("first_seen_at", now_iso),
+            "last_tried_at": now_iso,
             "reason": str(e),           # エラー内容を記録（デバッグ用）
             "retry_count": retry_count,
             "posted_at": None,          # 未投稿なので None
@@ -849,7 +1589,8 @@ def process_item(item, site, site_state, state, now, MODE, force_test, gemini_ke
 def main():
     """ボットのメイン処理。
 
-    全サイトを順番に処理し、最後に state を保存する。
+    全サイトの新着記事を並列に取得したうえで、投稿処理はサイトごとに順番に行う。
+    state は投稿成功ごととサイトの処理完了ごとに保存する。
     MODE が "test" の場合は Bluesky への実際の投稿は行わず、state も保存しない。
     """
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(message)s")
@@ -859,17 +1600,29 @@ def main():
     settings = config.get("settings", {})
     sites = config.get("sites", {})
 
+    # sites.yaml の log_level を反映する（WARNING 以上にすると INFO ログの整形自体が行われない）。
+    # 不正な値で実行全体を止めないよう、未知のレベル名は警告して INFO のままにする
+    log_level = str(settings.get("log_level", "INFO")).upper()
+    if log_level in logging.getLevelNamesMapping():
+        logging.getLogger().setLevel(log_level)
+    else:
+        logging.warning("Unknown log_level %r in %s; using INFO", settings.get("log_level"), SITES_FILE)
+
     MODE = settings.get("mode", "test").lower()           # "prod" or "test"
     force_test = settings.get("force_test_mode", False)   # True の場合 Gemini を呼ばない
     skip_first = settings.get("skip_existing_on_first_run", True)  # 初回実行時に既存記事をスキップするか
+    use_summary_cache = settings.get("use_summary_cache", True)    # 同一本文の Gemini 要約を使い回すか
 
-    # state を深コピーして作業用に使う（失敗時にファイルへの書き込みを防ぐため）
-    original_state = load_state()
-    state = json.loads(json.dumps(original_state))
+    # 読み込んだ state をそのまま作業用に使う。
+    # 保存は prod モードのみで、投稿成功ごと・サイトごとに write_json_atomic で書き出すため、
+    # 途中で失敗しても書き出し済みの時点の内容が残る（コピーを取っておく必要はない）。
+    state = load_state()
     state_dirty = False  # state に変更があった場合のみ保存するためのフラグ
 
     now = utc_now()
+    now_iso = isoformat(now)  # last_checked_at 等に記録する時刻文字列（全サイト共通で 1 回だけ生成）
     gemini_key = os.environ.get("GEMINI_API_KEY")
+    summary_cache = load_summary_cache() if use_summary_cache else None
 
     # =========================================================
     # Bluesky ログイン（prod モード時のみ）
@@ -877,6 +1630,10 @@ def main():
     # =========================================================
     bsky_client = None
     if MODE == "prod":
+        import httpx
+        from atproto import Client
+        from atproto_client.exceptions import InvokeTimeoutError
+
         bsky_client = Client(base_url="https://bsky.social")
 
         # デフォルトのタイムアウト（約5秒）では get_profile 等でタイムアウトしやすいため 30 秒に延長
@@ -893,27 +1650,29 @@ def main():
                 logging.info("Bluesky login successful")
                 break
             except InvokeTimeoutError:
-                logging.warning(f"Bluesky login timeout (attempt {attempt}/3)")
+                logging.warning("Bluesky login timeout (attempt %s/3)", attempt)
                 if attempt == 3:
                     raise  # 3回全て失敗したら処理を中断
                 time.sleep(5 * attempt)  # 5秒 → 10秒
 
     # =========================================================
-    # サイトごとの処理ループ
+    # サイトごとの準備（state 正規化・取得時間窓の決定）
     # =========================================================
-    for site_key, site in sites.items():
-        # enabled: false のサイトはスキップ
-        if not site.get("enabled", False):
-            continue
-
-        logging.info(f"[{site_key}] ---")
-
-        # サイト単位の集計カウンタ（最後にサマリログで出力）
-        fetched_count = 0
-        posted_count = 0
-        retry_posted_count = 0
-        cve_skip_count = 0
-        fail_count = 0
+    # enabled: false のサイトはスキップ
+    enabled_sites = [(site_key, site) for site_key, site in sites.items() if site.get("enabled", False)]
+
+    # max_sites_per_run が設定されている場合は、前回チェックが古い順（未チェックを最優先）に
+    # 上限件数だけ処理する。残りのサイトは次回以降の実行で順に処理される。
+    max_sites = settings.get("max_sites_per_run")
+    if max_sites and len(enabled_sites) > max_sites:
+        def _last_checked_key(entry):
+            raw_state = state.get(entry[0])
+            return (raw_state.get("last_checked_at") if isinstance(raw_state, dict) else None) or ""
+        enabled_sites = sorted(enabled_sites, key=_last_checked_key)[:max_sites]
+        logging.info("max_sites_per_run=%s: 今回処理するサイト %s", max_sites, [k for k, _ in enabled_sites])
+
+    site_jobs = {}  # site_key → (site, site_state, since, until, first_skip)
+    for site_key, site in enabled_sites:
         first_skip = False
 
         # --- state の正規化（旧フォーマット対応） ---
@@ -921,10 +1680,10 @@ def main():
         state[site_key] = site_state
         if migrated:
             if MODE == "prod":
-                logging.info(f"Migrate state for {site_key} (prod)")
+                logging.info("Migrate state for %s (prod)", site_key)
                 state_dirty = True
             else:
-                logging.info(f"Migrate state for {site_key} (TEST: not saved)")
+                logging.info("Migrate state for %s (TEST: not saved)", site_key)
 
         # --- 取得対象の時間窓を決定 ---
         last_checked = site_state.get("last_checked_at")
@@ -938,22 +1697,66 @@ def main():
             first_skip = skip_first and MODE == "prod"
 
         until = now
+        site_jobs[site_key] = (site, site_state, since, until, first_skip)
+
+    # CVE 横断重複チェック用に、全サイトの known_cves を 1 つの集合にまとめる
+    known_cve_index = build_known_cve_index(state)
+
+    # =========================================================
+    # 全サイトの新着記事を並列取得
+    # =========================================================
+    # フェッチは I/O 待ちが大半のため、サイトをまたいでスレッドで並列化する。
+    # retry_ids の記事（RETRY_LIMIT 件まで）の再取得も同じプールでまとめて行う。
+    # 結果（または例外）は Future に保持し、投稿処理はサイト順に直列で行う。
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as ex:
+        # 前回のフィード検証子を渡して条件付き GET にする。
+        # retry 待ちの記事があるサイトはフィード本体から再取得するため、検証子を渡さない
+        fetch_futures = {
+            site_key: ex.submit(
+                fetch_items, site, since, until,
+                None if site_state["retry_ids"] else site_state.get("feed_validators"),
+            )
+            for site_key, (site, site_state, since, until, _) in site_jobs.items()
+        }
+        retry_futures = {
+            site_key: [
+                (entry_key, ex.submit(fetch_item_for_retry, entry_key, site, site_state))
+                for entry_key in list(site_state.get("retry_ids", []))[:RETRY_LIMIT]
+            ]
+            for site_key, (site, site_state, _, _, _) in site_jobs.items()
+        }
+
+    # =========================================================
+    # サイトごとの処理ループ
+    # =========================================================
+    for site_key, (site, site_state, since, until, first_skip) in site_jobs.items():
+        logging.info("[%s] ---", site_key)
+
+        # サイト単位の集計カウンタ（最後にサマリログで出力）
+        fetched_count = 0
+        posted_count = 0
+        retry_posted_count = 0
+        cve_skip_count = 0
+        fail_count = 0
+
+        # 投稿文の整形関数はサイト単位で一度だけ生成して使い回す
+        formatter = make_formatter(site)
 
         # =========================================================
         # STEP 1: retry_ids の再試行（通常記事より先に処理）
         # =========================================================
         # 前回実行で失敗した記事（Gemini失敗フォールバック / 投稿エラー）を再試行する。
         # RETRY_LIMIT 件だけ処理し、残りは次回実行に持ち越す（1回の実行で処理しすぎない）。
-        retry_ids_snapshot = list(site_state.get("retry_ids", []))[:RETRY_LIMIT]
-        if retry_ids_snapshot:
-            logging.info(f"[{site_key}] retry_ids 再試行: {len(retry_ids_snapshot)} 件")
+        retry_fetches = retry_futures[site_key]
+        if retry_fetches:
+            logging.info("[%s] retry_ids 再試行: %s 件", site_key, len(retry_fetches))
 
-        for entry_key in retry_ids_snapshot:
-            # テキストは state に保存しないため、ソースから再取得する
-            retry_item = fetch_item_for_retry(entry_key, site, site_state)
+        for entry_key, retry_future in retry_fetches:
+            # テキストは state に保存しないため、ソースから再取得する（並列取得済み）
+            retry_item = retry_future.result()
             if retry_item is None:
                 # 記事が見つからない場合（フィードから消えた等）は次回に持ち越し
-                logging.warning(f"[{site_key}] retry再取得失敗: {entry_key}、次回に持ち越し")
+                logging.warning("[%s] retry再取得失敗: %s、次回に持ち越し", site_key, entry_key)
                 continue
 
             result = process_item(
@@ -967,11 +1770,17 @@ def main():
                 gemini_key=gemini_key,
                 bsky_client=bsky_client,
                 is_retry=True,
+                formatter=formatter,
+                summary_cache=summary_cache,
+                known_cve_index=known_cve_index,
             )
 
             # retry_ids の除去は process_item 内で完結しているためここではカウントのみ
             if result == "success":
                 retry_posted_count += 1
+                # 投稿直後に保存し、この後で異常終了しても同じ記事を再投稿しないようにする
+                if MODE == "prod":
+                    save_state(state)
             # "failed"  → retry_ids に残ったまま次回再試行
             # "skipped" → process_item 内で retry_ids から除去済み
 
@@ -979,40 +1788,60 @@ def main():
         # STEP 2: 通常記事の取得・処理
         # =========================================================
         try:
-            # サイト種別に応じたフェッチ関数を呼び出す
-            if site["type"] == "rss":
-                items = fetch_rss(site, since, until)
-            elif site["type"] == "nvd_api":
-                items = fetch_nvd(site, since, until)
-            elif site["type"] in ("jvn", "jvn_rss"):
-                items = fetch_jvn(site, since, until)
-            else:
+            # 並列取得済みの結果を受け取る（フェッチ中の例外はここで再送出される）
+            # 新しいフィード検証子は last_checked_at と同時に state へ反映する（下記参照）
+            items, new_feed_validators = fetch_futures[site_key].result()
+            if items is None:
                 continue  # 未対応種別はスキップ
         except RuntimeError as fetch_err:
             # NVD 429 等、フェッチレベルの失敗。
             # last_checked_at を進めないことで次回同じ時間窓を再取得する。
             # STEP 1 の retry 処理結果は保存するため state_dirty = True にする。
-            logging.warning(f"[{site_key}] 記事取得失敗のため通常処理をスキップ: {fetch_err}")
-            logging.info(f"[{site_key}] fetched=0, posted=0, retry_posted={retry_posted_count}, skipped=0, failed=0, retry_pending={len(site_state.get('retry_ids', []))}")
+            logging.warning("[%s] 記事取得失敗のため通常処理をスキップ: %s", site_key, fetch_err)
+            logging.info(
+                "[%s] fetched=0, posted=0, retry_posted=%s, skipped=0, failed=0, retry_pending=%s",
+                site_key, retry_posted_count, len(site_state.get("retry_ids", [])),
+            )
             state_dirty = True
+            if MODE == "prod":
+                save_state(state)
+                state_dirty = False
             continue
 
         fetched_count = len(items)
 
         if first_skip:
             # 初回実行: 既存記事は投稿せず、ステータスも記録しない
-            logging.info(f"[{site_key}] 初回実行のため既存記事 {fetched_count} 件をスキップ")
+            logging.info("[%s] 初回実行のため既存記事 %s 件をスキップ", site_key, fetched_count)
         else:
+            # 既に success / fallback ステータスの記事は再処理しない
+            # （fallback は retry_ids 経由で別途再試行される）
+            pending_items = []
             for item in items:
-                cid = item.get("id")
-                entry_key = cid or item.get("url")
-
-                # 既に success / fallback ステータスの記事は再処理しない
-                # （fallback は retry_ids 経由で別途再試行される）
+                entry_key = item.get("id") or item.get("url")
                 existing_entry = site_state.get("entries", {}).get(entry_key, {})
                 if existing_entry.get("status") in ("success", "fallback"):
                     continue
+                pending_items.append(item)
+
+            # 投稿ループの前に Gemini 要約をまとめて並列実行する
+            # （CVE 横断重複でスキップされる記事は要約しない）
+            to_process = [it for it in pending_items if not is_cve_already_posted(it.get("id"), site["type"], state, known_cve_index)]
+
+            # prod モードではリンクカード（OGP・サムネイル）も投稿前に並列取得しておく。
+            # 要約（Gemini）とは互いに独立した通信のため、要約と同時にバックグラウンドで取得する
+            with ThreadPoolExecutor(max_workers=1) as card_ex:
+                link_cards_future = None
+                if MODE == "prod":
+                    link_cards_future = card_ex.submit(prefetch_link_cards, [it.get("url") for it in to_process])
 
+                summaries = None
+                if not force_test:
+                    summaries = summarize_items(to_process, site, gemini_key, cache=summary_cache)
+
+                link_cards = link_cards_future.result() if link_cards_future else None
+
+            for item in pending_items:
                 result = process_item(
                     item=item,
                     site=site,
@@ -1024,30 +1853,55 @@ def main():
                     gemini_key=gemini_key,
                     bsky_client=bsky_client,
                     is_retry=False,
+                    summaries=summaries,
+                    formatter=formatter,
+                    summary_cache=summary_cache,
+                    link_cards=link_cards,
+                    known_cve_index=known_cve_index,
                 )
 
                 if result == "success":
                     posted_count += 1
+                    # 投稿直後に保存し、この後で異常終了しても同じ記事を再投稿しないようにする
+                    if MODE == "prod":
+                        save_state(state)
                 elif result == "skipped":
                     cve_skip_count += 1
                 elif result == "failed":
                     fail_count += 1
 
+        # posted_ids が膨らんだら古いものを削除（投稿ごとではなくサイトごとに 1 回）
+        pruned = prune_posted_ids(site_state["posted_ids"], now)
+        if pruned > 0:
+            logging.info("posted_ids prune: %s 件削除 (%s)", pruned, site_key)
+
         # チェック完了時刻を更新（次回実行時の取得開始時刻になる）
-        site_state["last_checked_at"] = isoformat(now)
+        site_state["last_checked_at"] = now_iso
+        # 今回の応答の ETag / Last-Modified は、時間窓の記事を処理し終えたこの時点で初めて保存する。
+        # 投稿途中で異常終了した場合に、次回 304 で未投稿の記事を取りこぼさないようにするため
+        if new_feed_validators is not None:
+            site_state["feed_validators"] = new_feed_validators
         state_dirty = True
 
+        # 途中のサイトで異常終了しても投稿済みの記録を失わないよう、サイトごとに保存する
+        # （再実行時の重複投稿を防ぐ）
+        if MODE == "prod":
+            save_state(state)
+            state_dirty = False
+
         # サイト単位の処理サマリをログ出力
         logging.info(
-            f"[{site_key}] fetched={fetched_count}, posted={posted_count}, "
-            f"retry_posted={retry_posted_count}, skipped={cve_skip_count}, "
-            f"failed={fail_count}, retry_pending={len(site_state.get('retry_ids', []))}"
+            "[%s] fetched=%s, posted=%s, retry_posted=%s, skipped=%s, failed=%s, retry_pending=%s",
+            site_key, fetched_count, posted_count, retry_posted_count,
+            cve_skip_count, fail_count, len(site_state.get("retry_ids", [])),
         )
 
-    # --- 全サイト処理完了後、state を保存 ---
+    # --- 全サイト処理完了後、未保存の変更があれば state を保存 ---
     # prod モードかつ変更がある場合のみ書き込む（test モードでは変更しない）
     if MODE == "prod" and state_dirty:
         save_state(state)
+    if MODE == "prod" and summary_cache is not None:
+        save_summary_cache(summary_cache)
 
 
 if __name__ == "__main__":
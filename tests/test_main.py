@@ -0,0 +1,407 @@
+"""main.py のテスト（python -m unittest discover tests で実行）。"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+from email.utils import format_datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import main  # noqa: E402
+
+FEED_URL = "https://example.com/feed.xml"
+ETAG = '"v1"'
+
+SITES_YAML = f"""
+settings:
+  mode: prod
+  force_test_mode: true
+  skip_existing_on_first_run: false
+  use_summary_cache: false
+sites:
+  example:
+    enabled: true
+    type: rss
+    display_name: Example
+    url: {FEED_URL}
+    max_items: 10
+"""
+
+
+def build_feed(now):
+    items = "".join(
+        f"<item><title>Article {i}</title><link>https://example.com/{i}</link>"
+        f"<guid>https://example.com/{i}</guid><description>Body {i}</description>"
+        f"<pubDate>{format_datetime(now - timedelta(minutes=10 * i))}</pubDate></item>"
+        for i in (1, 2, 3)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Example</title>{items}</channel></rss>'.encode()
+
+
+class Crash(BaseException):
+    """投稿処理中の異常終了（process_item の except Exception で握りつぶされないもの）。"""
+
+
+class FeedValidatorsCrashTest(unittest.TestCase):
+    """投稿途中で異常終了しても、再実行時に 304 で未投稿の記事を取りこぼさないこと。"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+        with open(main.SITES_FILE, "w", encoding="utf-8") as f:
+            f.write(SITES_YAML)
+        self.feed = build_feed(main.utc_now())
+        self.posted = []
+
+    def fake_get(self, url, headers=None, timeout=None):
+        resp = mock.Mock(url=url, headers={"ETag": ETAG, "Content-Type": "application/rss+xml"})
+        if (headers or {}).get("If-None-Match") == ETAG:
+            resp.status_code = 304
+            resp.content = b""
+        else:
+            resp.status_code = 200
+            resp.content = self.feed
+        return resp
+
+    def run_main(self, crash_on_post=None):
+        def fake_post(client, text, url, link_card=None):
+            if len(self.posted) + 1 == crash_on_post:
+                raise Crash()
+            self.posted.append(url)
+
+        main._feed_cache.clear()
+        with mock.patch.object(main.http_session, "get", side_effect=self.fake_get), \
+                mock.patch.object(main, "post_bluesky", side_effect=fake_post), \
+                mock.patch.object(main, "prefetch_link_cards", return_value={}), \
+                mock.patch("atproto.Client"):
+            main.main()
+
+    def test_rerun_after_crash_posts_remaining_items(self):
+        with self.assertRaises(Crash):
+            self.run_main(crash_on_post=2)
+        self.assertEqual(len(self.posted), 1)
+        self.assertNotIn("feed_validators", main.load_state()["example"])
+
+        self.run_main()
+        self.assertEqual(sorted(self.posted), [f"https://example.com/{i}" for i in (1, 2, 3)])
+        self.assertEqual(main.load_state()["example"]["feed_validators"], {"etag": ETAG})
+
+        # 全件処理後は検証子が保存され、次回は 304 で何も投稿しない
+        self.run_main()
+        self.assertEqual(len(self.posted), 3)
+
+
+class FakeClock:
+    """time.monotonic / time.sleep の代わりに使う時計（sleep で時刻が進む）。"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("monotonic", "sleep"):
+            patcher = mock.patch.object(main.time, name, side_effect=getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_no_wait_under_limit(self):
+        limiter = main.RateLimiter(3, 60, "test")
+        for _ in range(3):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_waits_until_oldest_call_leaves_window(self):
+        limiter = main.RateLimiter(2, 60, "test")
+        limiter.acquire()
+        self.clock.now += 10
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [50.0])
+        self.assertEqual(len(limiter.called_at), 2)
+
+    def test_calls_outside_window_are_dropped(self):
+        limiter = main.RateLimiter(1, 60, "test")
+        limiter.wait()
+        limiter.record()
+        self.clock.now += 61
+        limiter.wait()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(len(limiter.called_at), 0)
+
+
+class RateLimitedError(Exception):
+    """atproto の 429 例外の代わり（response 属性に status_code と headers を持つ）。"""
+
+    def __init__(self, headers=None):
+        super().__init__("429")
+        self.response = mock.Mock(status_code=429, headers=headers or {})
+
+
+class PostBlueskyBackoffTest(unittest.TestCase):
+    def test_wait_from_ratelimit_reset(self):
+        with mock.patch.object(main.time, "time", return_value=1000.0):
+            self.assertEqual(main.bluesky_rate_limit_wait(RateLimitedError({"RateLimit-Reset": "1030"})), 31)
+
+    def test_wait_from_retry_after_and_default(self):
+        self.assertEqual(main.bluesky_rate_limit_wait(RateLimitedError({"retry-after": "12"})), 12)
+        self.assertEqual(main.bluesky_rate_limit_wait(RateLimitedError()), main.POST_429_DEFAULT_WAIT)
+
+    def test_other_errors_are_not_rate_limits(self):
+        self.assertIsNone(main.bluesky_rate_limit_wait(ValueError("boom")))
+        err = RateLimitedError()
+        err.response.status_code = 500
+        self.assertIsNone(main.bluesky_rate_limit_wait(err))
+
+    def test_retries_after_429(self):
+        post = mock.Mock(side_effect=[RateLimitedError({"retry-after": "5"}), None])
+        with mock.patch.object(main, "post_bluesky", post), mock.patch.object(main.time, "sleep") as sleep:
+            main.post_bluesky_with_backoff(None, "text", "https://example.com/")
+        self.assertEqual(post.call_count, 2)
+        sleep.assert_called_once_with(5.0)
+
+    def test_long_reset_is_not_waited_for(self):
+        post = mock.Mock(side_effect=RateLimitedError({"retry-after": str(main.POST_429_WAIT_MAX + 1)}))
+        with mock.patch.object(main, "post_bluesky", post), mock.patch.object(main.time, "sleep") as sleep:
+            with self.assertRaises(RateLimitedError):
+                main.post_bluesky_with_backoff(None, "text", "https://example.com/")
+        self.assertEqual(post.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_gives_up_after_retry_max(self):
+        post = mock.Mock(side_effect=RateLimitedError({"retry-after": "1"}))
+        with mock.patch.object(main, "post_bluesky", post), mock.patch.object(main.time, "sleep"):
+            with self.assertRaises(RateLimitedError):
+                main.post_bluesky_with_backoff(None, "text", "https://example.com/")
+        self.assertEqual(post.call_count, main.POST_429_RETRY_MAX + 1)
+
+    def test_embed_429_is_not_retried_as_text_post(self):
+        client = mock.Mock()
+        client.send_post.side_effect = RateLimitedError()
+        card = {"title": "t", "description": "d", "image": None}
+        with self.assertRaises(RateLimitedError):
+            main.post_bluesky(client, "text", "https://example.com/", link_card=card)
+        self.assertEqual(client.send_post.call_count, 1)
+
+
+class SummarizeBatchTest(unittest.TestCase):
+    """summarize_batch / summarize_items のバッチ要約（記事番号での対応付けと個別要約へのフォールバック）。"""
+
+    def test_maps_results_by_index_not_position(self):
+        reply = '[{"i": 2, "summary": "B"}, {"i": 1, "summary": "A"}]'
+        with mock.patch.object(main, "generate_text", return_value=reply) as gen:
+            self.assertEqual(main.summarize_batch(["a", "b"], "key", "rss"), ["A", "B"])
+        self.assertIs(gen.call_args.kwargs["config"]["response_schema"], main.SUMMARY_BATCH_SCHEMA)
+
+    def test_missing_and_duplicate_indexes_fall_back_to_summarize(self):
+        reply = '[{"i": 1, "summary": "A"}, {"i": 2, "summary": "B"}, {"i": 2, "summary": "B2"}, {"i": 9, "summary": "X"}]'
+        with mock.patch.object(main, "generate_text", return_value=reply), \
+                mock.patch.object(main, "summarize", side_effect=lambda t, *a, **k: f"single:{t}") as single:
+            self.assertEqual(main.summarize_batch(["a", "b", "c"], "key", "rss"), ["A", "single:b", "single:c"])
+        self.assertEqual([c.args[0] for c in single.call_args_list], ["b", "c"])
+
+    def test_unparsable_reply_returns_none(self):
+        for reply in ("not json", '{"i": 1, "summary": "A"}'):
+            with mock.patch.object(main, "generate_text", return_value=reply):
+                self.assertIsNone(main.summarize_batch(["a", "b"], "key", "rss"))
+
+    def test_api_failure_returns_none_per_item(self):
+        with mock.patch.object(main, "generate_text", return_value=None):
+            self.assertEqual(main.summarize_batch(["a", "b"], "key", "rss"), [None, None])
+
+    def test_results_are_truncated_and_cached(self):
+        cache = {}
+        reply = '[{"i": 1, "summary": "%s"}, {"i": 2, "summary": " B "}]' % ("あ" * 150)
+        with mock.patch.object(main, "generate_text", return_value=reply):
+            results = main.summarize_batch(["a", "b"], "key", "rss", cache=cache)
+        self.assertEqual(len(results[0]), main.SUMMARY_HARD_LIMIT)
+        self.assertEqual(results[1], "B")
+        self.assertEqual(main.get_cached_summary(cache, "b", "rss"), "B")
+
+    def test_summarize_items_batches_cache_misses_only(self):
+        site = {"type": "rss"}
+        items = [{"url": f"https://example.com/{i}", "text": f"Line {i} of the article body"} for i in range(3)]
+        cache = {}
+        main.store_cached_summary(cache, main.body_trim(items[0]["text"], site_type="rss"), "rss", "cached")
+        reply = '[{"i": 1, "summary": "S1"}, {"i": 2, "summary": "S2"}]'
+        with mock.patch.object(main, "generate_text", return_value=reply) as gen:
+            summaries = main.summarize_items(items, site, "key", cache=cache)
+        self.assertEqual(gen.call_count, 1)
+        self.assertEqual(summaries, {
+            "https://example.com/0": "cached",
+            "https://example.com/1": "S1",
+            "https://example.com/2": "S2",
+        })
+
+    def test_summarize_items_falls_back_when_batch_unparsable(self):
+        site = {"type": "rss"}
+        items = [{"url": f"https://example.com/{i}", "text": f"Line {i} of the article body"} for i in range(2)]
+        with mock.patch.object(main, "generate_text", side_effect=["not json", "S0", "S1"]) as gen:
+            summaries = main.summarize_items(items, site, "key")
+        self.assertEqual(gen.call_count, 3)
+        self.assertEqual(sorted(summaries.values()), ["S0", "S1"])
+
+
+class SummaryCacheTest(unittest.TestCase):
+    """要約キャッシュ（キーの生成・ヒット時の Gemini 省略・保存時の期限切れ削除）。"""
+
+    def test_key_depends_on_site_type_and_text(self):
+        key = main.summary_cache_key("body", "nvd_api")
+        self.assertEqual(key, main.summary_cache_key("body", "nvd_api"))
+        self.assertTrue(key.startswith("nvd_api:"))
+        self.assertNotEqual(key, main.summary_cache_key("body", "jvn"))
+        self.assertNotEqual(key, main.summary_cache_key("body2", "nvd_api"))
+        self.assertEqual(main.summary_cache_key("body"), main.summary_cache_key("body", "rss"))
+
+    def test_summarize_uses_cache_before_gemini(self):
+        cache = {}
+        with mock.patch.object(main, "generate_text", return_value="要約") as gen:
+            self.assertEqual(main.summarize("body", "key", "rss", cache=cache), "要約")
+            self.assertEqual(main.summarize("body", "key", "rss", cache=cache), "要約")
+        self.assertEqual(gen.call_count, 1)
+        self.assertIsNone(main.get_cached_summary(cache, "body", "nvd_api"))
+        self.assertIsNone(main.get_cached_summary(None, "body", "rss"))
+
+    def test_failed_summary_is_not_cached(self):
+        cache = {}
+        with mock.patch.object(main, "generate_text", return_value=None):
+            self.assertIsNone(main.summarize("body", "key", "rss", cache=cache))
+        self.assertEqual(cache, {})
+
+    def test_save_prunes_expired_and_excess_entries(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        now = main.utc_now()
+        expired = main.isoformat(now - timedelta(days=main.SUMMARY_CACHE_RETENTION_DAYS + 1))
+        cache = {"expired": {"summary": "old", "cached_at": expired}}
+        for i in range(main.SUMMARY_CACHE_MAX + 2):
+            cache[f"k{i}"] = {"summary": str(i), "cached_at": main.isoformat(now - timedelta(minutes=i))}
+
+        with mock.patch.object(main, "SUMMARY_CACHE_FILE", os.path.join(tmpdir.name, "summary_cache.json")):
+            main.save_summary_cache(cache)
+            saved = main.load_summary_cache()
+
+        self.assertEqual(len(saved), main.SUMMARY_CACHE_MAX)
+        self.assertNotIn("expired", saved)
+        # cached_at の古い順に削除される（k0 が最新）
+        self.assertIn("k0", saved)
+        self.assertNotIn(f"k{main.SUMMARY_CACHE_MAX + 1}", saved)
+
+
+class PrunePostedIdsTest(unittest.TestCase):
+    """prune_posted_ids（保持期限切れと上限超過分の削除）。"""
+
+    def test_drops_entries_older_than_retention(self):
+        now = main.utc_now()
+        posted_ids = {
+            "old": main.isoformat(now - timedelta(days=main.POSTED_ID_RETENTION_DAYS, seconds=1)),
+            "new": main.isoformat(now - timedelta(days=1)),
+        }
+        self.assertEqual(main.prune_posted_ids(posted_ids, now), 1)
+        self.assertEqual(list(posted_ids), ["new"])
+
+    def test_trims_oldest_entries_over_max(self):
+        now = main.utc_now()
+        # 挿入順と投稿日時の順を逆にして、日時の古い順に削除されることを確かめる
+        posted_ids = {f"id{i}": main.isoformat(now - timedelta(minutes=i)) for i in range(main.POSTED_ID_MAX + 3)}
+        self.assertEqual(main.prune_posted_ids(posted_ids, now), 3)
+        self.assertEqual(len(posted_ids), main.POSTED_ID_MAX)
+        self.assertIn("id0", posted_ids)
+        self.assertNotIn(f"id{main.POSTED_ID_MAX}", posted_ids)
+
+    def test_no_change_returns_zero(self):
+        now = main.utc_now()
+        posted_ids = {"a": main.isoformat(now)}
+        self.assertEqual(main.prune_posted_ids(posted_ids, now), 0)
+        self.assertEqual(posted_ids, {"a": main.isoformat(now)})
+
+
+def legacy_body_trim(text, max_len=2500, site_type=None):
+    """最適化前の body_trim（出力が変わっていないことの比較用）。"""
+    if site_type in ("nvd_api", "jvn"):
+        lines = [
+            l.strip()
+            for l in text.splitlines()
+            if any(k in l.lower() for k in [
+                "allow", "allows", "could", "can",
+                "vulnerability", "attack", "execute",
+                "disclosure", "denial"
+            ])
+        ]
+        return " ".join(lines)[:max_len]
+    lines = [l.strip() for l in text.splitlines() if len(l.strip()) > 10]
+    return "\n".join(lines[:6])[:max_len]
+
+
+class BodyTrimTest(unittest.TestCase):
+    """body_trim の出力が最適化前の実装と一致すること。"""
+
+    TEXTS = [
+        "",
+        "A Vulnerability in Foo ALLOWS remote attackers\n\n  to EXECUTE code.  \nUnrelated line\nDenial of service\n",
+        "short\n   \nThis line is long enough\nok\n" + "\n".join(f"Paragraph number {i} of the article" for i in range(10)),
+        "\n".join(f"Line {i}: an attacker could cause disclosure" for i in range(200)),
+        "Ünïcode İstanbul line that CAN be attacked\r\nwindows line ending allows\r\n",
+    ]
+
+    def test_matches_legacy_implementation(self):
+        for site_type in ("nvd_api", "jvn", "rss", None):
+            for max_len in (2500, 50):
+                for text in self.TEXTS:
+                    with self.subTest(site_type=site_type, max_len=max_len, text=text[:30]):
+                        self.assertEqual(
+                            main.body_trim(text, max_len=max_len, site_type=site_type),
+                            legacy_body_trim(text, max_len=max_len, site_type=site_type),
+                        )
+
+
+class GeminiError(Exception):
+    """google-genai の APIError の代わり（code / status 属性を持つ）。"""
+
+    def __init__(self, code, status, message=""):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+class RetryableGeminiErrorTest(unittest.TestCase):
+    """is_retryable_gemini_error（構造化されたステータスでの判定）。"""
+
+    def test_structured_codes(self):
+        for code, status in ((429, "RESOURCE_EXHAUSTED"), (500, "INTERNAL"), (503, "UNAVAILABLE"), (504, "DEADLINE_EXCEEDED")):
+            self.assertTrue(main.is_retryable_gemini_error(GeminiError(code, status)))
+        for code, status in ((400, "INVALID_ARGUMENT"), (401, "UNAUTHENTICATED"), (403, "PERMISSION_DENIED")):
+            self.assertFalse(main.is_retryable_gemini_error(GeminiError(code, status)))
+
+    def test_message_text_does_not_override_code(self):
+        err = GeminiError(400, "INVALID_ARGUMENT", "prompt is over 500 tokens; internal limit")
+        self.assertFalse(main.is_retryable_gemini_error(err))
+
+    def test_status_without_code(self):
+        err = GeminiError(None, "UNAVAILABLE")
+        self.assertTrue(main.is_retryable_gemini_error(err))
+        err.status = "NOT_FOUND"
+        self.assertFalse(main.is_retryable_gemini_error(err))
+
+    def test_plain_exceptions_match_only_leading_status(self):
+        self.assertTrue(main.is_retryable_gemini_error(Exception("503 UNAVAILABLE. overloaded")))
+        self.assertTrue(main.is_retryable_gemini_error(Exception("RESOURCE_EXHAUSTED")))
+        self.assertFalse(main.is_retryable_gemini_error(Exception("internal error 500")))
+        self.assertFalse(main.is_retryable_gemini_error(ConnectionError("Name or service not known")))
+
+
+if __name__ == "__main__":
+    unittest.main()